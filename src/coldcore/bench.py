@@ -0,0 +1,263 @@
+"""
+Benchmarks for coldcore's hot paths, run against an in-process fake bitcoind
+(see fake_bitcoind.py) with synthetic wallets of various sizes.
+
+Run from src/ (or with `make bench`):
+
+    python -m coldcore.bench [--utxos 10,1000,100000] [--latency 0.0005]
+
+Results are compared against bench_baseline.json; anything slower than the
+baseline by more than --tolerance is reported, and the exit code is nonzero.
+Use --save to record a new baseline. Timings are machine-dependent, so only
+compare baselines recorded on the same hardware.
+"""
+import argparse
+import base64
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+from pathlib import Path
+from unittest import mock
+
+from . import crypto, main
+from .fake_bitcoind import FakeBitcoind
+
+
+BASELINE_PATH = Path(__file__).parent / "bench_baseline.json"
+DEFAULT_SIZES = (10, 1000, 100_000)
+DEFAULT_LATENCY = 0.0005
+DEFAULT_TOLERANCE = 0.25
+
+XPUB = (
+    "xpub6BUBVXTHPtiWZuJT7ZVArTEXi5FcGNX4d4TMLTuRSCcVEQ37BASyq17BoSBxwLgaVBvyR9Gb"
+    "tnVeKhAAwdmqHppzrukRk55XHgc32idASq2"
+)
+
+CONFIG = """
+[default]
+bitcoind_json_url = {url}
+default_wallet = coldcard-3d88d0cf
+
+[coldcard-3d88d0cf]
+fingerprint = 3d88d0cf
+deriv_path = /84h/0h
+xpub = {xpub}
+bitcoind_name = coldcard-3d88d0cf
+bitcoind_json_url =
+earliest_block =
+checksum_map = {{"0": "deadbeef", "1": "deadbeef"}}
+"""
+
+
+class Bench(t.NamedTuple):
+    name: str
+    func: t.Callable[[], t.Any]
+    # Whether timings depend on the wallet size; if not, only run once.
+    sized: bool = True
+
+
+def timeit(func: t.Callable, min_time: float = 0.5, max_runs: int = 50) -> float:
+    """The median time of `func()`, over as many runs as fit in `min_time`."""
+    times = []
+    deadline = time.perf_counter() + min_time
+    while len(times) < max_runs:
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+        if time.perf_counter() > deadline:
+            break
+    return statistics.median(times)
+
+
+@contextlib.contextmanager
+def environment(url: str):
+    """
+    Point coldcore at the node at `url` with a throwaway config, and discard its
+    output.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        conf = Path(tmp) / "config.ini"
+        conf.write_text(CONFIG.format(url=url, xpub=XPUB))
+
+        old_cwd = os.getcwd()
+        old_args = main.cli.args
+        main.cli.args = main.cli.parser.parse_args(["--config", str(conf)])
+        os.chdir(tmp)
+        try:
+            with open(os.devnull, "w") as null, contextlib.redirect_stdout(
+                null
+            ), contextlib.redirect_stderr(null), mock.patch(
+                "builtins.input", return_value="y"
+            ):
+                yield
+        finally:
+            os.chdir(old_cwd)
+            main.cli.args = old_args
+            main.get_rpc.__dict__.pop("_rpc_cache", None)
+            main._wallet_sessions = main.WalletSessions()
+
+
+def run_cli(*args: str):
+    """Run coldcore in a fresh interpreter, as a user would."""
+    subprocess.run(
+        [sys.executable, "-m", "coldcore.main", *args],
+        cwd=Path(__file__).parent.parent,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+def benchmarks(node: FakeBitcoind) -> t.List[Bench]:
+    config, (wall, *_) = main._get_config_required()
+    rpcw = config.rpc(wall)
+    to_address = node.address(10 ** 9)
+
+    # A changed wallet for the `watch` loop to diff against: some coins spent,
+    # some received, and the rest a block deeper.
+    before = main.get_utxos(rpcw)
+    node.spend_utxos(max(1, len(node.utxos) // 100))
+    node.add_utxos(max(1, len(node.utxos) // 100), confirmations=0)
+    node.mine()
+    after = main.get_utxos(rpcw)
+
+    def first_rpc():
+        # Everything from loading the config to getting a response, with a cold
+        # connection cache (though not a cold pool).
+        main.get_rpc.__dict__.pop("_rpc_cache", None)
+        conf, (w, *_) = main._get_config_required()
+        conf.rpc(w).uptime()
+
+    psbt_path = main._prepare_send(config, rpcw, to_address, "0.01", None)
+    psbt_hex = base64.b64encode(Path(psbt_path).read_bytes()).decode()
+    tx_hex = main._psbt_to_tx_hex(rpcw, Path(psbt_path))
+
+    return [
+        # Process startup up to the point a command would start work.
+        Bench("startup_version", lambda: run_cli("--version"), sized=False),
+        Bench("startup_help", lambda: run_cli("balance", "--help"), sized=False),
+        Bench("config_load", lambda: main._get_config_required(), sized=False),
+        Bench("first_rpc", first_rpc, sized=False),
+        Bench("xpub_to_fp", lambda: crypto.xpub_to_fp(XPUB), sized=False),
+        Bench("balance", lambda: main.balance()),
+        Bench("balance_json", lambda: main.balance("json")),
+        Bench("get_utxos", lambda: main.get_utxos(rpcw)),
+        Bench("watch_diff", lambda: main._report_utxo_changes(before, after)),
+        Bench(
+            "prepare_send",
+            lambda: main._prepare_send(config, rpcw, to_address, "0.01", None),
+            sized=False,
+        ),
+        Bench(
+            "confirm_broadcast",
+            lambda: main.confirm_broadcast(rpcw, tx_hex, psbt_hex),
+            sized=False,
+        ),
+    ]
+
+
+def run_benchmarks(
+    sizes: t.Sequence[int] = DEFAULT_SIZES,
+    latency: float = DEFAULT_LATENCY,
+    min_time: float = 0.5,
+    only: t.Optional[t.Sequence[str]] = None,
+) -> t.Dict[str, float]:
+    """Return the median time, in seconds, of each benchmark at each size."""
+    results: t.Dict[str, float] = {}
+
+    for i, size in enumerate(sizes):
+        with FakeBitcoind(num_utxos=size, latency=latency) as node:
+            with environment(node.url):
+                for b in benchmarks(node):
+                    if (only and b.name not in only) or (not b.sized and i > 0):
+                        continue
+                    key = f"{b.name}[{size}]" if b.sized else b.name
+                    results[key] = timeit(b.func, min_time=min_time)
+
+    return results
+
+
+def compare(
+    results: t.Dict[str, float],
+    baseline: t.Dict[str, float],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> t.Tuple[str, t.List[str]]:
+    """Return a report of `results` against `baseline`, and a list of regressions."""
+    lines = [f"{'benchmark':<28}{'time':>12}{'baseline':>12}{'change':>10}"]
+    regressions = []
+
+    for key, secs in results.items():
+        base = baseline.get(key)
+        if base:
+            change = (secs - base) / base
+            flag = ""
+            if change > tolerance:
+                regressions.append(key)
+                flag = "  <-- slower"
+            lines.append(
+                f"{key:<28}{secs * 1000:>10.3f}ms{base * 1000:>10.3f}ms"
+                f"{change:>+10.0%}{flag}"
+            )
+        else:
+            lines.append(f"{key:<28}{secs * 1000:>10.3f}ms{'-':>12}{'-':>10}")
+
+    return ("\n".join(lines), regressions)
+
+
+def cli(argv: t.Optional[t.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--utxos",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="comma-separated wallet sizes (up to 1000000)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=DEFAULT_LATENCY,
+        help="seconds of simulated latency per RPC request",
+    )
+    parser.add_argument("--min-time", type=float, default=0.5)
+    parser.add_argument("--only", help="comma-separated benchmark names to run")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="fractional slowdown over baseline to flag as a regression",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write a new baseline")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        [int(n) for n in args.utxos.split(",")],
+        args.latency,
+        args.min_time,
+        args.only.split(",") if args.only else None,
+    )
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+
+    report, regressions = compare(results, baseline, args.tolerance)
+    print(report)
+
+    if args.save:
+        args.baseline.write_text(json.dumps(dict(baseline, **results), indent=2) + "\n")
+        print(f"\nwrote baseline to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,607 @@
+"""
+An in-process stand-in for Bitcoin Core's JSON-RPC server, serving a synthetic
+watch-only wallet of any size. Used by the benchmarks (see bench.py) and tests.
+
+    with FakeBitcoind(num_utxos=100_000, latency=0.001) as node:
+        rpc = RawProxy(node.url)
+
+This isn't meant to be a faithful simulation of Core - just enough of it, with
+realistically-shaped responses, to exercise coldcore's RPC paths.
+
+ReplayBitcoind instead serves back a session recorded from a real node with
+`coldcore --rpc-record`. Either can be run standalone and pointed at with
+`coldcore --rpc`, e.g. to profile the dashboard offline:
+
+    python -m coldcore.fake_bitcoind --replay session.jsonl.gz --speed 2
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+import typing as t
+import urllib.parse as urlparse
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+SUBSIDY_SATS = 625_000_000
+
+# Core's (pre-0.21) "already loaded" error code, which is what coldcore expects.
+RPC_WALLET_ERROR = -4
+RPC_WALLET_NOT_FOUND = -18
+
+# Methods that, like Core's, must be sent to a loaded wallet's endpoint.
+WALLET_METHODS = frozenset(
+    {
+        "getwalletinfo",
+        "importmulti",
+        "getnewaddress",
+        "getaddressinfo",
+        "listunspent",
+        "rescanblockchain",
+        "walletcreatefundedpsbt",
+        "fakereceive",
+        "fakespend",
+    }
+)
+
+
+def _h(*parts) -> str:
+    return hashlib.sha256(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def _btc(sats: int) -> float:
+    # Floats print with the shortest repr that round-trips, so 8 decimal places
+    # at most; Core's JSON amounts look the same.
+    return sats / 100_000_000
+
+
+class FakeBitcoind:
+    """
+    Args:
+        num_utxos: the size of the wallet
+        latency: seconds to wait before answering each request (or batch)
+        height: the starting chain height
+    """
+
+    def __init__(
+        self,
+        num_utxos: int = 1000,
+        latency: float = 0.0,
+        height: int = 650_000,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latency = latency
+        self.height = height
+        self.wallets: t.Set[str] = set()
+        self.requests = 0
+        self.calls: t.Dict[str, int] = {}
+        # Guards wallet state; RPC methods run with it held.
+        self._lock = threading.RLock()
+        self._next_utxo = 0
+        self._txcount = 0
+        # Bumped on every change to the wallet; keys the encoded-result cache.
+        self._version = 0
+        self._encoded: t.Dict[t.Tuple[str, str], t.Tuple[int, bytes]] = {}
+
+        self.utxos: t.Dict[t.Tuple[str, int], t.Dict] = {}
+        self.add_utxos(num_utxos)
+
+        self.server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self.server.daemon_threads = True
+        self._thread: t.Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://user:pass@{host}:{port}"
+
+    def start(self) -> "FakeBitcoind":
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._thread:
+            self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeBitcoind":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Wallet state ---------------------------------------------------------
+
+    def add_utxos(self, num: int, confirmations: t.Optional[int] = None):
+        with self._lock:
+            for _ in range(num):
+                i = self._next_utxo
+                self._next_utxo += 1
+                h = _h("utxo", i)
+                confs = (i % 100) if confirmations is None else confirmations
+                self.utxos[(h, i % 4)] = {
+                    "txid": h,
+                    "vout": i % 4,
+                    "address": self.address(i),
+                    "label": "",
+                    "scriptPubKey": "0014" + h[:40],
+                    "amount_sats": 1000 + int(h[:8], 16) % 10_000_000,
+                    "confirmations": confs,
+                    "spendable": False,
+                    "solvable": True,
+                    "desc": f"wpkh([deadbeef/84h/0h/0/{i}]02{h[:64]})#{h[:8]}",
+                    "safe": True,
+                }
+            self._txcount += num
+            self._version += 1
+
+    def spend_utxos(self, num: int):
+        with self._lock:
+            for key in list(self.utxos)[:num]:
+                del self.utxos[key]
+            self._txcount += 1
+            self._version += 1
+
+    def mine(self, blocks: int = 1):
+        """Advance the tip, confirming everything in the wallet further."""
+        with self._lock:
+            self.height += blocks
+            for u in self.utxos.values():
+                u["confirmations"] += blocks
+            self._version += 1
+
+    def address(self, i: int) -> str:
+        return "bc1q" + _h("addr", i)[:38]
+
+    # --- RPC dispatch ---------------------------------------------------------
+
+    def respond(self, req: t.Dict, path: str = "/") -> bytes:
+        """Return the encoded JSON-RPC response for a single request."""
+        method = req.get("method", "")
+        params = req.get("params") or []
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+        impl = getattr(self, f"rpc_{method}", None)
+        if impl is None:
+            return self._encode_response(
+                req, None, {"code": -32601, "message": "Method not found"}
+            )
+
+        if method in WALLET_METHODS and path.startswith("/wallet/"):
+            name = urlparse.unquote(path[len("/wallet/") :])
+            with self._lock:
+                loaded = name in self.wallets
+            if not loaded:
+                error = {
+                    "code": RPC_WALLET_NOT_FOUND,
+                    "message": "Requested wallet does not exist or is not loaded",
+                }
+                return self._encode_response(req, None, error)
+
+        if method in ("listunspent", "scantxoutset"):
+            # Re-encoding a large wallet for every call would dominate timings.
+            key = (method, json.dumps(params))
+            with self._lock:
+                cached = self._encoded.get(key)
+                if not (cached and cached[0] == self._version):
+                    cached = (self._version, json.dumps(impl(*params)).encode())
+                    self._encoded[key] = cached
+            return self._encode_response(req, cached[1], None)
+
+        try:
+            with self._lock:
+                result = impl(*params)
+        except _RPCError as e:
+            return self._encode_response(req, None, e.error)
+        return self._encode_response(req, json.dumps(result).encode(), None)
+
+    def _encode_response(
+        self, req: t.Dict, result: t.Optional[bytes], error: t.Optional[t.Dict]
+    ) -> bytes:
+        return b'{"result": %s, "error": %s, "id": %s}' % (
+            result if result is not None else b"null",
+            json.dumps(error).encode(),
+            json.dumps(req.get("id")).encode(),
+        )
+
+    def _listunspent_entry(self, u: t.Dict) -> t.Dict:
+        out = dict(u)
+        out["amount"] = _btc(out.pop("amount_sats"))
+        return out
+
+    # --- RPC methods ----------------------------------------------------------
+
+    def rpc_help(self, *args):
+        return "== Fake bitcoind =="
+
+    def rpc_uptime(self):
+        return 1000
+
+    def rpc_getbestblockhash(self):
+        return _h("block", self.height)
+
+    def rpc_getblockcount(self):
+        return self.height
+
+    def rpc_getblockhash(self, height):
+        return _h("block", height)
+
+    def rpc_getblockchaininfo(self):
+        return {
+            "chain": "main",
+            "blocks": self.height,
+            "headers": self.height,
+            "bestblockhash": self.rpc_getbestblockhash(),
+            "verificationprogress": 0.9999,
+            "initialblockdownload": False,
+            "pruned": False,
+        }
+
+    def rpc_getnetworkinfo(self):
+        return {
+            "version": 200100,
+            "subversion": "/Satoshi:0.20.1/",
+            "connections": 10,
+            "networkactive": True,
+            "warnings": "",
+        }
+
+    def rpc_getblockstats(self, hash_or_height, *args):
+        return {
+            "blockhash": hash_or_height,
+            "height": self.height,
+            "feerate_percentiles": [1, 3, 10, 25, 60],
+            "subsidy": SUBSIDY_SATS,
+            "totalfee": 25_000_000,
+            "txs": 2500,
+        }
+
+    def rpc_listwallets(self):
+        return sorted(self.wallets)
+
+    def rpc_loadwallet(self, name, *args):
+        if name in self.wallets:
+            raise _RPCError(RPC_WALLET_ERROR, f"Wallet {name} is already loaded")
+        self.wallets.add(name)
+        return {"name": name, "warning": ""}
+
+    def rpc_createwallet(self, name, *args):
+        return self.rpc_loadwallet(name)
+
+    def rpc_unloadwallet(self, name=None, *args):
+        self.wallets.discard(name)
+        return {"warning": ""}
+
+    def rpc_getwalletinfo(self):
+        return {
+            "walletname": "",
+            "txcount": self._txcount,
+            "private_keys_enabled": False,
+            "lastprocessedblock": {
+                "hash": self.rpc_getbestblockhash(),
+                "height": self.height,
+            },
+            "scanning": False,
+        }
+
+    def rpc_getdescriptorinfo(self, desc):
+        return {
+            "descriptor": desc,
+            "checksum": _h("desc", desc)[:8],
+            "isrange": True,
+            "issolvable": True,
+            "hasprivatekeys": False,
+        }
+
+    def rpc_importmulti(self, requests, *args):
+        return [{"success": True} for _ in requests]
+
+    def rpc_getnewaddress(self, *args):
+        with self._lock:
+            i = self._next_utxo
+            self._next_utxo += 1
+        return self.address(i)
+
+    def rpc_getaddressinfo(self, address):
+        ours = address.startswith("bc1q")
+        return {
+            "address": address,
+            "ismine": False,
+            "iswatchonly": ours,
+            "solvable": ours,
+            "ischange": False,
+            "labels": [""],
+        }
+
+    def rpc_listunspent(self, minconf=1, *args):
+        return [
+            self._listunspent_entry(u)
+            for u in self.utxos.values()
+            if u["confirmations"] >= minconf
+        ]
+
+    def rpc_scantxoutset(self, action, scanobjects=None):
+        unspents = [
+            {
+                "txid": u["txid"],
+                "vout": u["vout"],
+                "scriptPubKey": u["scriptPubKey"],
+                "desc": u["desc"],
+                "amount": _btc(u["amount_sats"]),
+                "height": self.height - u["confirmations"],
+            }
+            for u in self.utxos.values()
+            if u["confirmations"] > 0
+        ]
+        return {
+            "success": True,
+            "txouts": len(unspents) * 1000,
+            "height": self.height,
+            "bestblock": self.rpc_getbestblockhash(),
+            "unspents": unspents,
+            "total_amount": _btc(sum(u["amount_sats"] for u in self.utxos.values())),
+        }
+
+    def rpc_rescanblockchain(self, start_height=0, stop_height=None):
+        return {"start_height": start_height, "stop_height": self.height}
+
+    def _select(self, inputs: t.List[t.Dict], amount_sats: int) -> t.List[t.Dict]:
+        if inputs:
+            return [self.utxos[(i["txid"], i["vout"])] for i in inputs]
+        chosen, total = [], 0
+        for u in self.utxos.values():
+            chosen.append(u)
+            total += u["amount_sats"]
+            if total > amount_sats:
+                break
+        return chosen
+
+    def rpc_walletcreatefundedpsbt(self, inputs, outputs, *args):
+        [(to_address, amount)] = outputs[0].items()
+        amount_sats = round(float(amount) * 100_000_000)
+        chosen = self._select(inputs, amount_sats)
+        fee_sats = 110 + 68 * len(chosen)
+        tx = {
+            "inputs": [(u["txid"], u["vout"]) for u in chosen],
+            "outputs": [(to_address, amount_sats)],
+            "fee": fee_sats,
+        }
+        return {
+            "psbt": base64.b64encode(b"psbt\xff" + json.dumps(tx).encode()).decode(),
+            "fee": _btc(fee_sats),
+            "changepos": 1,
+        }
+
+    def _decode_tx(self, encoded: bytes) -> t.Dict:
+        return json.loads(encoded.split(b"\xff", 1)[1])
+
+    def rpc_decodepsbt(self, psbt):
+        tx = self._decode_tx(base64.b64decode(psbt))
+        inputs = [self.utxos.get(tuple(i)) for i in tx["inputs"]]
+        return {
+            "tx": {
+                "txid": _h("tx", psbt),
+                "vin": [{"txid": txid, "vout": vout} for (txid, vout) in tx["inputs"]],
+                "vout": self._vouts(tx),
+            },
+            "inputs": [
+                {
+                    "witness_utxo": {
+                        "amount": _btc(u["amount_sats"]),
+                        "scriptPubKey": {
+                            "hex": u["scriptPubKey"],
+                            "type": "witness_v0_keyhash",
+                            "address": u["address"],
+                        },
+                    }
+                }
+                for u in inputs
+                if u
+            ],
+            "outputs": [{} for _ in tx["outputs"]],
+            "fee": _btc(tx["fee"]),
+        }
+
+    def _vouts(self, tx: t.Dict) -> t.List[t.Dict]:
+        return [
+            {
+                "value": _btc(sats),
+                "n": n,
+                "scriptPubKey": {"type": "witness_v0_keyhash", "addresses": [addr]},
+            }
+            for n, (addr, sats) in enumerate(tx["outputs"])
+        ]
+
+    def rpc_finalizepsbt(self, psbt, *args):
+        raw = base64.b64decode(psbt)
+        return {"hex": raw.hex(), "complete": True}
+
+    def rpc_decoderawtransaction(self, hexstring, *args):
+        tx = self._decode_tx(bytes.fromhex(hexstring))
+        return {
+            "txid": _h("tx", hexstring),
+            "vin": [{"txid": txid, "vout": vout} for (txid, vout) in tx["inputs"]],
+            "vout": self._vouts(tx),
+        }
+
+    def rpc_testmempoolaccept(self, rawtxs, *args):
+        return [{"txid": _h("tx", r), "allowed": True} for r in rawtxs]
+
+    def rpc_sendrawtransaction(self, hexstring, *args):
+        return _h("tx", hexstring)
+
+    # --- Simulation control ---------------------------------------------------
+
+    def rpc_generatetoaddress(self, nblocks, address=None, *args):
+        self.mine(nblocks)
+        return [_h("block", self.height - i) for i in reversed(range(nblocks))]
+
+    def rpc_fakereceive(self, num=1):
+        """Not in Core: add `num` unconfirmed coins to the wallet."""
+        self.add_utxos(num, confirmations=0)
+        return len(self.utxos)
+
+    def rpc_fakespend(self, num=1):
+        """Not in Core: spend the `num` oldest coins in the wallet."""
+        self.spend_utxos(num)
+        return len(self.utxos)
+
+
+class ReplayBitcoind(FakeBitcoind):
+    """
+    Serves back a session recorded with `bitcoin_rpc.RPCRecorder`.
+
+    Each request gets the response recorded for the same URL path, method and
+    params, after the latency it was recorded with (divided by `speed`; 0 means
+    no delay). Repeated requests get the recorded responses in order, and then
+    the last one. Requests with params that weren't recorded get the latest
+    response recorded for the method, if any.
+    """
+
+    def __init__(
+        self, recording: str, speed: float = 1.0, host: str = "127.0.0.1", port: int = 0
+    ):
+        super().__init__(num_utxos=0, host=host, port=port)
+        self.speed = speed
+        # (path, method, params) -> [(elapsed, response), ...]
+        self.replies: t.Dict[t.Tuple[str, str, str], t.Deque] = {}
+        self._latest: t.Dict[t.Tuple[str, str], t.Tuple[float, t.Dict]] = {}
+        self.misses = 0
+
+        for entry in load_recording(recording):
+            self._add(entry)
+
+    def _add(self, entry: t.Dict):
+        path = urlparse.urlparse(entry["url"]).path or "/"
+        try:
+            request = json.loads(entry["request"])
+            response = json.loads(entry["response"])
+        except ValueError:
+            # e.g. a streamed response that was abandoned partway.
+            return
+
+        if isinstance(request, list):
+            if not isinstance(response, list):
+                return
+            by_id = {r.get("id"): r for r in response}
+            pairs = [(r, by_id.get(r["id"])) for r in request]
+        else:
+            pairs = [(request, response)]
+
+        elapsed = entry["elapsed"] / len(pairs)
+        for (req, resp) in pairs:
+            if resp is None:
+                continue
+            key = (path, req["method"], json.dumps(req.get("params") or []))
+            self.replies.setdefault(key, deque()).append((elapsed, resp))
+            self._latest[key[:2]] = (elapsed, resp)
+
+    def respond(self, req: t.Dict, path: str = "/") -> bytes:
+        method = req.get("method", "")
+        key = (path, method, json.dumps(req.get("params") or []))
+
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            replies = self.replies.get(key)
+            if replies:
+                reply = replies[0] if len(replies) == 1 else replies.popleft()
+            else:
+                self.misses += 1
+                reply = self._latest.get(key[:2])
+
+        if reply is None:
+            error = {"code": -32601, "message": f"{method} not in recording"}
+            return self._encode_response(req, None, error)
+
+        (elapsed, resp) = reply
+        if self.speed:
+            time.sleep(elapsed / self.speed)
+        return json.dumps(dict(resp, id=req.get("id"))).encode()
+
+
+def load_recording(path: str) -> t.Iterator[t.Dict]:
+    """Yield the entries of a recording made with `bitcoin_rpc.RPCRecorder`."""
+    with gzip.open(path, "rt", encoding="utf8") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != 1:
+            raise ValueError(f"unsupported recording version: {header.get('version')}")
+        for line in f:
+            yield json.loads(line)
+
+
+class _RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.error = {"code": code, "message": message}
+
+
+def _handler_for(node: FakeBitcoind):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            req = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with node._lock:
+                node.requests += 1
+
+            if node.latency:
+                time.sleep(node.latency)
+
+            if isinstance(req, list):
+                body = (
+                    b"[" + b", ".join(node.respond(r, self.path) for r in req) + b"]"
+                )
+            else:
+                body = node.respond(req, self.path)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a fake bitcoind JSON-RPC interface."
+    )
+    parser.add_argument("--port", type=int, default=18999, help="0 for any")
+    parser.add_argument("--utxos", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--replay", help="a recording made with --rpc-record")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="replay speed; 0 for no delays"
+    )
+    args = parser.parse_args()
+
+    if args.replay:
+        node: FakeBitcoind = ReplayBitcoind(args.replay, args.speed, port=args.port)
+    else:
+        node = FakeBitcoind(args.utxos, args.latency, port=args.port)
+
+    print(f"serving on {node.url} (ctrl-c to stop)", flush=True)
+    try:
+        node.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        node.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
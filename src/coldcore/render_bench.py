@@ -0,0 +1,424 @@
+"""
+A headless rendering benchmark for the curses UI: runs `draw_menu` and its
+scenes against an in-memory virtual screen, with a synthetic wallet of any size,
+and measures each frame's CPU time, allocations, and (an estimate of) the bytes
+curses would write to the terminal.
+
+Run from src/ (or with `make bench-render`):
+
+    python -m coldcore.render_bench [--utxos 10,1000,10000] [--frames 100]
+
+As with bench.py, results are compared against a baseline (the median CPU time
+per frame) if one has been saved with --save.
+"""
+import argparse
+import contextlib
+import datetime
+import hashlib
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import typing as t
+from collections import deque
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from . import main, ui
+from .bench import compare, DEFAULT_TOLERANCE
+from .thirdparty.bitcoin_rpc import Amount
+
+
+BASELINE_PATH = Path(__file__).parent / "render_baseline.json"
+DEFAULT_SIZES = (10, 1000, 10_000)
+DEFAULT_FRAMES = 100
+DEFAULT_SCREEN = (50, 200)
+
+# Rough costs, in bytes, of the escape sequences curses emits to move the cursor,
+# change attributes, and clear the screen.
+CURSOR_MOVE_BYTES = 8
+ATTR_CHANGE_BYTES = 6
+CLEAR_BYTES = 4
+
+Cell = t.Tuple[str, int]
+BLANK: Cell = (" ", 0)
+
+
+class Window:
+    """
+    Enough of a curses window for the scenes to draw on. Subwindows made with
+    `derwin` draw into their root screen's cells, as in curses.
+    """
+
+    def __init__(self, root: "VirtualScreen", height: int, width: int, y: int, x: int):
+        self.root = root
+        self.height = height
+        self.width = width
+        self.y = y
+        self.x = x
+        self._attr = 0
+
+    def getmaxyx(self) -> t.Tuple[int, int]:
+        return (self.height, self.width)
+
+    def derwin(self, height: int, width: int, y: int, x: int) -> "Window":
+        return Window(self.root, height, width, self.y + y, self.x + x)
+
+    def addstr(self, y: int, x: int, msg: str, attr: int = 0):
+        root = self.root
+        root.addstr_calls += 1
+        root.addstr_bytes += len(msg.encode())
+        attr |= self._attr
+
+        for line in msg.split("\n"):
+            row_y = self.y + y
+            if 0 <= y < self.height and row_y < root.height:
+                row = root.cells[row_y]
+                for i, ch in enumerate(line[: max(0, self.width - x)]):
+                    if self.x + x + i < root.width:
+                        row[self.x + x + i] = (ch, attr)
+            # Like curses, a newline continues at the start of the next line.
+            y += 1
+            x = 0
+
+    def attron(self, attr: int):
+        self._attr |= attr
+
+    def attroff(self, attr: int):
+        self._attr &= ~attr
+
+    def border(self, *args):
+        h, w = self.height, self.width
+        self.addstr(0, 0, "┌" + "─" * (w - 2) + "┐")
+        for y in range(1, h - 1):
+            self.addstr(y, 0, "│")
+            self.addstr(y, w - 1, "│")
+        self.addstr(h - 1, 0, "└" + "─" * (w - 2) + "┘")
+
+    box = border
+
+    def erase(self):
+        for row in self.root.cells[self.y : self.y + self.height]:
+            row[self.x : self.x + self.width] = [BLANK] * len(
+                row[self.x : self.x + self.width]
+            )
+
+    def clear(self):
+        # clear() also makes the next refresh repaint the whole screen.
+        self.erase()
+        self.root.repaint = True
+
+    def refresh(self, *args):
+        pass
+
+    def move(self, y: int, x: int):
+        pass
+
+    timeout = scrollok = refresh
+
+
+class VirtualScreen(Window):
+    """
+    The root window. Each `getch` ends a frame: `on_frame` is called with the
+    number of bytes curses would have had to write to bring the terminal up to
+    date, and then the next key of `keys` is returned (-1 once they run out).
+    """
+
+    def __init__(
+        self,
+        height: int = DEFAULT_SCREEN[0],
+        width: int = DEFAULT_SCREEN[1],
+        keys: t.Iterable[int] = (),
+        on_frame: t.Optional[t.Callable[[int], None]] = None,
+    ):
+        self.cells: t.List[t.List[Cell]] = [[BLANK] * width for _ in range(height)]
+        super().__init__(self, height, width, 0, 0)
+        self.keys = deque(keys)
+        self.on_frame = on_frame
+        self.repaint = False
+        self.addstr_calls = 0
+        self.addstr_bytes = 0
+        # What the terminal is showing, as of the last frame.
+        self._shown: t.List[t.List[Cell]] = [list(r) for r in self.cells]
+
+    def text(self) -> t.List[str]:
+        return ["".join(ch for ch, _ in row).rstrip() for row in self.cells]
+
+    def flush(self) -> int:
+        """Estimate the bytes needed to update the terminal, as curses would."""
+        out = 0
+        if self.repaint:
+            out += CLEAR_BYTES
+            self._shown = [[BLANK] * self.width for _ in range(self.height)]
+            self.repaint = False
+
+        for (row, shown) in zip(self.cells, self._shown):
+            if row == shown:
+                continue
+            changed = [i for i, (new, old) in enumerate(zip(row, shown)) if new != old]
+            out += CURSOR_MOVE_BYTES
+            attr = 0
+            for (ch, a) in row[changed[0] : changed[-1] + 1]:
+                if a != attr:
+                    out += ATTR_CHANGE_BYTES
+                    attr = a
+                out += len(ch.encode())
+            shown[:] = row
+
+        return out
+
+    def getch(self) -> int:
+        bytes_out = self.flush()
+        if self.on_frame:
+            self.on_frame(bytes_out)
+        return self.keys.popleft() if self.keys else -1
+
+
+class Frame(t.NamedTuple):
+    # Process CPU time spent drawing the frame.
+    cpu: float
+    # Peak bytes allocated while drawing.
+    peak_alloc: int
+    # Estimated bytes written to the terminal, and what was passed to addstr.
+    bytes_out: int
+    addstr_bytes: int
+
+
+def _h(*parts) -> str:
+    return hashlib.sha256(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def fake_utxos(num: int) -> t.Dict[str, main.UTXO]:
+    """A wallet of `num` coins, shaped like what the dashboard polls for."""
+    utxos = [
+        main.UTXO(
+            "bc1q" + _h("addr", i)[:38],
+            Amount(1000 + int(_h("utxo", i)[:8], 16) % 10_000_000),
+            i % 100,
+            _h("utxo", i),
+            i % 4,
+        )
+        for i in range(num)
+    ]
+    return {u.address: u for u in utxos}
+
+
+def fake_block(height: int) -> ui.Block:
+    return ui.Block(
+        _h("block", height),
+        height,
+        datetime.datetime(2020, 10, 1) + datetime.timedelta(minutes=10 * height),
+        10,
+        Amount(625_000_000),
+        2500,
+    )
+
+
+class _FakeRPC:
+    host = "127.0.0.1"
+    port = 8332
+
+    def getnetworkinfo(self):
+        return {"subversion": "/Satoshi:0.20.1/"}
+
+
+@contextlib.contextmanager
+def _headless():
+    """Stub out the parts of curses that need a real terminal."""
+
+    def keyname(k: int) -> bytes:
+        if k < 0:
+            raise ValueError(k)
+        return chr(k).encode()
+
+    with mock.patch.object(ui, "colr", lambda n: n << 8), mock.patch.multiple(
+        ui.curses,
+        start_color=lambda: None,
+        init_pair=lambda *args: None,
+        noecho=lambda: None,
+        keyname=keyname,
+    ):
+        try:
+            yield
+        finally:
+            # The dashboard stops its (here nonexistent) polling threads on 'q'.
+            ui.stop_threads_event.clear()
+
+
+def render_frames(
+    scene: str = "dashboard",
+    utxos: int = 1000,
+    frames: int = DEFAULT_FRAMES,
+    screen: t.Tuple[int, int] = DEFAULT_SCREEN,
+    block_every: int = 10,
+    trace_allocs: bool = False,
+) -> t.List[Frame]:
+    """
+    Run `draw_menu` on `scene` ("home" or "dashboard") for `frames` frames.
+
+    Instead of polling bitcoind, the dashboard gets `utxos` synthetic coins. Every
+    `block_every` frames a block is "mined", confirming them all further, so that
+    the screen changes as it would in use.
+    """
+    wallet = fake_utxos(utxos)
+    height = 650_000
+    rpc = _FakeRPC()
+    config = SimpleNamespace(rpc=lambda *args: rpc)
+    wallet_configs = [SimpleNamespace(name="coldcard-3d88d0cf")]
+    scenes: t.List[ui.DashboardScene] = []
+
+    def start_threads(self):
+        if not self.threads_started:
+            self.utxos.update(wallet)
+            self.blocks.extend(fake_block(height - i) for i in reversed(range(10)))
+            self.rpc = rpc
+            self.threads_started = True
+            scenes.append(self)
+
+    results: t.List[Frame] = []
+    start = {"cpu": 0.0, "addstr_bytes": 0}
+
+    def begin():
+        if trace_allocs:
+            tracemalloc.clear_traces()
+        start["addstr_bytes"] = scr.addstr_bytes
+        start["cpu"] = time.process_time()
+
+    def on_frame(bytes_out: int):
+        nonlocal height
+        cpu = time.process_time() - start["cpu"]
+        peak = tracemalloc.get_traced_memory()[1] if trace_allocs else 0
+        results.append(
+            Frame(cpu, peak, bytes_out, scr.addstr_bytes - start["addstr_bytes"])
+        )
+
+        if scenes and len(results) % block_every == 0:
+            height += 1
+            for u in wallet.values():
+                u.num_confs += 1
+            with ui.blocks_lock:
+                scenes[0].blocks.append(fake_block(height))
+                del scenes[0].blocks[: -ui.MAX_BLOCK_HISTORY]
+        begin()
+
+    scr = VirtualScreen(*screen, keys=[-1] * (frames - 1) + [ord("q")])
+    scr.on_frame = on_frame
+    action = {"home": ui.GoHome, "dashboard": ui.GoDashboard}[scene]
+
+    was_tracing = tracemalloc.is_tracing()
+    if trace_allocs and not was_tracing:
+        tracemalloc.start()
+    try:
+        with _headless(), mock.patch.object(
+            ui.DashboardScene, "start_threads", start_threads
+        ):
+            begin()
+            ui.draw_menu(scr, config, wallet_configs, main.WizardController(), action)
+    finally:
+        if trace_allocs and not was_tracing:
+            tracemalloc.stop()
+
+    return results
+
+
+def summarize(frames: t.Sequence[Frame], allocs: t.Sequence[Frame]) -> t.Dict:
+    """Per-frame figures: CPU times from `frames`, allocations from `allocs`."""
+    cpu = sorted(f.cpu for f in frames)
+    return {
+        "cpu": statistics.median(cpu),
+        "cpu_p95": cpu[int(len(cpu) * 0.95)],
+        "peak_alloc": statistics.median(f.peak_alloc for f in allocs),
+        "bytes_out": statistics.median(f.bytes_out for f in frames),
+        "first_bytes_out": frames[0].bytes_out,
+        "addstr_bytes": statistics.median(f.addstr_bytes for f in frames),
+    }
+
+
+def run_render_benchmarks(
+    sizes: t.Sequence[int] = DEFAULT_SIZES,
+    frames: int = DEFAULT_FRAMES,
+    screen: t.Tuple[int, int] = DEFAULT_SCREEN,
+) -> t.Dict[str, t.Dict]:
+    """
+    Return per-frame figures for the home scene, and the dashboard at each
+    wallet size. Allocations are measured in a separate run, since tracing them
+    slows everything else down.
+    """
+    runs = [("home", 0)] + [("dashboard", size) for size in sizes]
+    results = {}
+
+    for (scene, size) in runs:
+        key = f"{scene}[{size}]" if scene == "dashboard" else scene
+        results[key] = summarize(
+            render_frames(scene, size, frames, screen),
+            render_frames(scene, size, frames, screen, trace_allocs=True),
+        )
+
+    return results
+
+
+def report(results: t.Dict[str, t.Dict]) -> str:
+    lines = [
+        f"{'scene':<20}{'cpu':>10}{'p95':>10}{'peak alloc':>12}"
+        f"{'tty bytes':>11}{'(first)':>9}{'addstr':>9}"
+    ]
+    for key, r in results.items():
+        lines.append(
+            f"{key:<20}{r['cpu'] * 1000:>8.3f}ms{r['cpu_p95'] * 1000:>8.3f}ms"
+            f"{r['peak_alloc'] / 1024:>10.1f}KB{r['bytes_out']:>11.0f}{r['first_bytes_out']:>9}{r['addstr_bytes']:>9.0f}"
+        )
+    return "\n".join(lines)
+
+
+def cli(argv: t.Optional[t.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--utxos",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="comma-separated wallet sizes",
+    )
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES)
+    parser.add_argument(
+        "--screen",
+        default="x".join(map(str, DEFAULT_SCREEN)),
+        help="the virtual screen's size, as LINESxCOLS",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="fractional slowdown over baseline to flag as a regression",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write a new baseline")
+    args = parser.parse_args(argv)
+
+    (lines, cols) = (int(n) for n in args.screen.split("x"))
+    results = run_render_benchmarks(
+        [int(n) for n in args.utxos.split(",")], args.frames, (lines, cols)
+    )
+    print(report(results))
+
+    times = {f"render_{key}": r["cpu"] for key, r in results.items()}
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+
+    if args.save:
+        args.baseline.write_text(json.dumps(dict(baseline, **times), indent=2) + "\n")
+        print(f"\nwrote baseline to {args.baseline}")
+        return 0
+
+    if baseline:
+        comparison, regressions = compare(times, baseline, args.tolerance)
+        print("\n" + comparison)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
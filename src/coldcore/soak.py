@@ -0,0 +1,279 @@
+"""
+A soak test for the long-running parts of coldcore - `watch` and the dashboard
+- against a fake bitcoind (run in a subprocess, so that its memory use isn't
+counted) that mines blocks and churns wallet transactions at an accelerated
+rate. Memory is sampled throughout (with tracemalloc, and RSS
+where available); if either grows faster than the allowed rate, the allocation
+sites that grew most are reported and the exit code is nonzero.
+
+Run from src/:
+
+    python -m coldcore.soak [--duration 3600] [--target watch,dashboard]
+
+Short runs are dominated by noise (e.g. whichever calls happen to be in flight
+when a sample is taken), so soak for at least tens of minutes before trusting a
+failure.
+"""
+import argparse
+import contextlib
+import gc
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import typing as t
+from pathlib import Path
+from unittest import mock
+
+from . import main, ui
+from .bench import environment
+from .render_bench import VirtualScreen
+from .thirdparty.bitcoin_rpc import RawProxy
+
+
+DEFAULT_MAX_GROWTH_MB = 10.0
+DEFAULT_MAX_RSS_GROWTH_MB = 100.0
+MB = 1024 * 1024
+
+
+class Sample(t.NamedTuple):
+    at: float
+    # Bytes allocated by Python code under test, and the process's RSS.
+    traced: int
+    rss: t.Optional[int]
+
+
+class SoakResult(t.NamedTuple):
+    samples: t.List[Sample]
+    # Bytes per hour, fitted over the samples after warmup.
+    traced_growth: float
+    rss_growth: t.Optional[float]
+    top_growth: t.List[tracemalloc.StatisticDiff]
+    # Exceptions that stopped a target (or the simulation) early.
+    errors: t.List[BaseException]
+
+
+def growth_per_hour(points: t.Sequence[t.Tuple[float, float]]) -> float:
+    """The least-squares slope of (seconds, value) points, per hour."""
+    if len(points) < 2:
+        return 0.0
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var:
+        return 0.0
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    return cov / var * 3600
+
+
+@contextlib.contextmanager
+def fake_node(utxos: int) -> t.Iterator[str]:
+    """Run a fake bitcoind in a subprocess, yielding its URL."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "coldcore.fake_bitcoind"]
+        + ["--port", "0", "--utxos", str(utxos)],
+        cwd=Path(__file__).parent.parent,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        # "serving on <url> ..."
+        yield proc.stdout.readline().split()[2]  # type: ignore
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def _simulate(url: str, stop: threading.Event, block_interval, tx_interval, state):
+    """Mine blocks and churn the wallet's coins until stopped."""
+    rpc = RawProxy(url)
+    initial = rpc.fakereceive(0)
+    next_block = time.monotonic() + block_interval
+
+    while not stop.wait(tx_interval):
+        if rpc.fakereceive(1) > initial:
+            rpc.fakespend(1)
+        if time.monotonic() >= next_block:
+            rpc.generatetoaddress(1, "")
+            state["blocks"] += 1
+            next_block += block_interval
+
+
+def _drive_dashboard(stop: threading.Event, interval: float):
+    config, walls = main._get_config_required()
+    scene = ui.DashboardScene(VirtualScreen(), config, walls, main.WizardController())
+    try:
+        while not stop.is_set():
+            scene.draw(-1)
+            time.sleep(interval)
+    finally:
+        scene.stop_threads()
+        # So the dashboard can be started again in this process.
+        ui.stop_threads_event.clear()
+
+
+def _drive_watch(stop: threading.Event):
+    config, (wall, *_) = main._get_config_required()
+    main._watch(config.rpc(wall), stop)
+
+
+def run_soak(
+    duration: float = 600,
+    targets: t.Sequence[str] = ("watch", "dashboard"),
+    utxos: int = 1000,
+    block_interval: float = 1.0,
+    tx_interval: float = 0.05,
+    sample_interval: float = 10.0,
+    warmup: float = 0.2,
+    progress: t.Optional[t.IO] = None,
+) -> SoakResult:
+    """
+    Run the given targets for `duration` seconds, sampling memory every
+    `sample_interval`. Growth is measured after the first `warmup` fraction of
+    the run, once caches and the like have filled.
+    """
+    drivers = {
+        "watch": lambda stop: _drive_watch(stop),
+        "dashboard": lambda stop: _drive_dashboard(stop, 0.1),
+    }
+    samples: t.List[Sample] = []
+    errors: t.List[BaseException] = []
+    stop = threading.Event()
+    state = {"blocks": 0}
+
+    def run(func, *args):
+        try:
+            func(*args)
+        except BaseException as e:
+            errors.append(e)
+
+    # Allocation sites are compared between the first sample after warmup and
+    # the last.
+    snapshots: t.List[tracemalloc.Snapshot] = []
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(10)
+
+    try:
+        with fake_node(utxos) as url, environment(url), mock.patch.object(
+            ui, "colr", lambda n: 0
+        ):
+            threads = [
+                threading.Thread(
+                    target=run,
+                    args=(_simulate, url, stop, block_interval, tx_interval, state),
+                    daemon=True,
+                )
+            ] + [
+                threading.Thread(target=run, args=(drivers[name], stop), daemon=True)
+                for name in targets
+            ]
+            for th in threads:
+                th.start()
+
+            start = time.monotonic()
+            try:
+                while True:
+                    elapsed = time.monotonic() - start
+                    gc.collect()
+                    traced = tracemalloc.get_traced_memory()[0]
+                    samples.append(Sample(elapsed, traced, ui.rss_bytes()))
+                    done = elapsed >= duration or errors
+                    if (elapsed >= duration * warmup and not snapshots) or done:
+                        snapshots.append(tracemalloc.take_snapshot())
+                    if progress:
+                        s = samples[-1]
+                        rss = f"{s.rss / MB:.1f}MB" if s.rss else "?"
+                        print(
+                            f"[{elapsed:>7.0f}s] traced {s.traced / MB:.2f}MB "
+                            f"rss {rss} blocks mined {state['blocks']}",
+                            file=progress,
+                        )
+                    if done:
+                        break
+                    time.sleep(min(sample_interval, max(0, duration - elapsed)))
+            finally:
+                stop.set()
+                for th in threads:
+                    th.join(10)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    measured = [s for s in samples if s.at >= duration * warmup] or samples
+    rss = [(s.at, s.rss) for s in measured if s.rss is not None]
+
+    return SoakResult(
+        samples,
+        growth_per_hour([(s.at, s.traced) for s in measured]),
+        growth_per_hour(rss) if rss else None,
+        [
+            d
+            for d in snapshots[-1].compare_to(snapshots[0], "lineno")
+            if d.size_diff > 0
+        ][:10]
+        if snapshots
+        else [],
+        errors,
+    )
+
+
+def cli(argv: t.Optional[t.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--duration", type=float, default=600, help="seconds")
+    parser.add_argument("--target", default="watch,dashboard")
+    parser.add_argument("--utxos", type=int, default=1000)
+    parser.add_argument("--block-interval", type=float, default=1.0)
+    parser.add_argument("--tx-interval", type=float, default=0.05)
+    parser.add_argument("--sample-interval", type=float, default=10.0)
+    parser.add_argument(
+        "--max-growth",
+        type=float,
+        default=DEFAULT_MAX_GROWTH_MB,
+        help="allowed growth of traced Python memory, in MB/hour",
+    )
+    parser.add_argument(
+        "--max-rss-growth",
+        type=float,
+        default=DEFAULT_MAX_RSS_GROWTH_MB,
+        help="allowed growth of resident memory, in MB/hour",
+    )
+    args = parser.parse_args(argv)
+
+    result = run_soak(
+        args.duration,
+        args.target.split(","),
+        args.utxos,
+        args.block_interval,
+        args.tx_interval,
+        args.sample_interval,
+        progress=sys.stderr,
+    )
+
+    print(f"\ntraced memory growth: {result.traced_growth / MB:.2f} MB/hour")
+    if result.rss_growth is not None:
+        print(f"resident memory growth: {result.rss_growth / MB:.2f} MB/hour")
+
+    failed = result.traced_growth > args.max_growth * MB or (
+        result.rss_growth is not None and result.rss_growth > args.max_rss_growth * MB
+    )
+
+    if result.top_growth:
+        print("\nallocation sites that grew most:")
+        for diff in result.top_growth:
+            print(f"  {diff}")
+
+    if result.errors:
+        print(f"\nFAILED: stopped early: {result.errors[0]!r}")
+        return 1
+    if failed:
+        print("\nFAILED: memory grew faster than allowed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    with contextlib.suppress(KeyboardInterrupt):
+        sys.exit(cli())
@@ -0,0 +1,29 @@
+from .bench import run_benchmarks, compare
+
+
+def test_benchmarks_run():
+    results = run_benchmarks(sizes=[10, 20], latency=0, min_time=0)
+
+    assert results.keys() == {
+        "startup_version",
+        "startup_help",
+        "config_load",
+        "first_rpc",
+        "xpub_to_fp",
+        "prepare_send",
+        "confirm_broadcast",
+        *(
+            f"{name}[{size}]"
+            for name in ("balance", "balance_json", "get_utxos", "watch_diff")
+            for size in (10, 20)
+        ),
+    }
+    assert all(secs > 0 for secs in results.values())
+
+
+def test_compare():
+    report, regressions = compare(
+        {"a": 1.0, "b": 2.0, "c": 1.0}, {"a": 1.1, "b": 1.0}, tolerance=0.25
+    )
+    assert regressions == ["b"]
+    assert "<-- slower" in report
@@ -8,6 +8,9 @@ def test_parse_public():
         def getdescriptorinfo(*args, **kwargs):
             return {"checksum": "deadbeef"}
 
+        def batch(self, calls):
+            return [getattr(self, method)(*args) for (method, *args) in calls]
+
     wall = CCWallet.from_io(io.StringIO(pub1), MockRPC())
 
     expected = {
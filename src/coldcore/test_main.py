@@ -0,0 +1,445 @@
+import logging
+import os
+import pstats
+import stat
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from configparser import ConfigParser
+from dataclasses import replace
+
+import pytest
+
+from . import main
+from .bench import XPUB, environment
+from .fake_bitcoind import FakeBitcoind
+from .thirdparty.bitcoin_rpc import LATENCY_BUCKETS
+
+
+def test_profiling(tmp_path, capsys):
+    def work():
+        return sorted(str(i) for i in range(10_000))
+
+    with main.profiling("both", tmp_path / "prof", "balance"):
+        work()
+        th = threading.Thread(target=work)
+        th.start()
+        th.join()
+
+    [prof] = (tmp_path / "prof").glob("coldcore-balance-*.prof")
+    [alloc] = (tmp_path / "prof").glob("coldcore-balance-*.alloc.txt")
+    assert alloc.read_text().startswith("peak traced memory:")
+
+    stats = pstats.Stats(str(prof))
+    # Both the calling thread and the one it started were profiled.
+    [calls] = [v[1] for k, v in stats.stats.items() if k[2] == "work"]
+    assert calls == 2
+
+    err = capsys.readouterr().err
+    assert "CPU profile written to" in err
+    assert "own ms" in err
+
+
+def test_startup_imports():
+    """Modules only some commands need aren't imported at startup."""
+    got = subprocess.run(
+        [sys.executable, "-c", "import sys, coldcore.main; print(*sys.modules)"],
+        cwd=main.Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lazy = {
+        "asyncio",
+        "cProfile",
+        "http.server",
+        "logging.handlers",
+        "platform",
+        "pstats",
+        "socketserver",
+        "tracemalloc",
+    }
+    assert lazy.isdisjoint(got.stdout.split())
+
+
+def test_setup_logging(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main.cli, "args", main.cli.parser.parse_args([]))
+    assert main.setup_logging() is None
+    assert not (tmp_path / "coldcore.log").exists()
+
+    main.cli.args.debug = True
+    handlers = list(main.root_logger.handlers)
+    level = main.root_logger.level
+    try:
+        assert main.setup_logging() == main.Path("coldcore.log")
+        logging.getLogger("rpc").debug("hello %s", "world")
+        main.stop_logging()
+    finally:
+        main.root_logger.handlers = handlers
+        main.root_logger.setLevel(level)
+
+    assert "[rpc] DEBUG - hello world" in (tmp_path / "coldcore.log").read_text()
+
+
+def test_decryption_overlaps_rpc_connect(tmp_path, monkeypatch):
+    def uptime_calls():
+        m = main.default_rpc_stats.methods.get("uptime")
+        return m.calls if m else 0
+
+    with FakeBitcoind(num_utxos=5) as node, environment(node.url):
+        contents = main.Path(main._config_path()).read_text()
+        main.cli.args.config = str(tmp_path / "config.ini.gpg")
+        main.cli.args.rpc = node.url
+        before = uptime_calls()
+        connected_while_decrypting = []
+
+        def slow_decrypt(self, path):
+            deadline = time.monotonic() + 5
+            while uptime_calls() == before and time.monotonic() < deadline:
+                time.sleep(0.01)
+            connected_while_decrypting.append(uptime_calls() > before)
+            return contents
+
+        monkeypatch.setattr(main.GPG, "read", slow_decrypt)
+        (config, (wall, *_)) = main._get_config_required()
+
+    assert connected_while_decrypting == [True]
+    assert wall.name == "coldcard-3d88d0cf"
+
+
+def test_wallets_decrypted_lazily(tmp_path, monkeypatch):
+    conf_path = tmp_path / "config.ini"
+    shards = {}
+    conf = ConfigParser()
+    conf["default"] = {"default_wallet": "coldcard-3d88d0cf"}
+    for fp in ("3d88d0cf", "00000000"):
+        name = f"coldcard-{fp}"
+        path = str(tmp_path / f"{name}.ini.gpg")
+        conf[name] = {"load_from": path}
+        shard = ConfigParser()
+        shard[name] = {
+            "fingerprint": fp,
+            "deriv_path": "/84h/0h",
+            "xpub": XPUB,
+            "bitcoind_name": name,
+            "checksum_map": '{"0": "deadbeef", "1": "deadbeef"}',
+        }
+        shards[path] = main._ini_to_str(shard)
+
+    reads = []
+    writes = []
+    barrier = None
+
+    def fake_read(self, path):
+        reads.append(path)
+        if barrier:
+            barrier.wait()
+        return shards[path]
+
+    monkeypatch.setattr(main.GPG, "read", fake_read)
+    monkeypatch.setattr(main.GPG, "write", lambda s, *args: writes.append(args))
+
+    with FakeBitcoind(num_utxos=1) as node, environment(node.url):
+        conf["default"]["bitcoind_json_url"] = node.url
+        conf_path.write_text(main._ini_to_str(conf))
+        main.cli.args.config = str(conf_path)
+
+        (config, (wall, other)) = main._get_config_required()
+        assert reads == []
+        assert (wall.name, other.name) == ("coldcard-3d88d0cf", "coldcard-00000000")
+        assert wall.xpub == XPUB
+        assert reads == [str(tmp_path / "coldcard-3d88d0cf.ini.gpg")]
+
+        # Wallets needed together are decrypted at the same time.
+        reads.clear()
+        barrier = threading.Barrier(2, timeout=5)
+        (config, walls) = main._get_config_required()
+        assert [w.fingerprint for w in main._load_wallets(walls)] == [
+            "3d88d0cf",
+            "00000000",
+        ]
+        assert len(reads) == 2
+
+        # Only the changed wallet's file is rewritten.
+        before = conf_path.read_text()
+        changed = walls[1].load()
+        changed.bitcoind_json_url = "http://elsewhere:8332"
+        config.add_new_wallet(changed)
+        config.write()
+        [(path, content)] = writes
+        assert path == str(tmp_path / "coldcard-00000000.ini.gpg")
+        assert "http://elsewhere:8332" in content
+        assert conf_path.read_text() == before
+
+        # A malformed wallet file is reported once, without decrypting it again.
+        bad = str(tmp_path / "coldcard-00000000.ini.gpg")
+        shards[bad] = "not an INI file"
+        barrier = None
+        reads.clear()
+        (config, walls) = main._get_config_required()
+        with pytest.raises(SystemExit):
+            main._load_wallets(walls)
+        with pytest.raises(SystemExit):
+            walls[1].xpub
+        assert reads.count(bad) == 1
+
+
+def test_wallet_sessions():
+    def calls(method):
+        m = main.default_rpc_stats.methods.get(method)
+        return m.calls if m else 0
+
+    with FakeBitcoind(num_utxos=1) as node, environment(node.url):
+        config, (wall, *_) = main._get_config_required()
+        other = replace(wall, fingerprint="00000000")
+        theirs = replace(wall, fingerprint="11111111")
+        node.wallets.add(theirs.name)
+        before = (calls("listwallets"), calls("loadwallet"))
+
+        config.preload_wallets([wall, other, theirs])
+        assert node.wallets == {wall.name, other.name, theirs.name}
+        rpcw = config.rpc(wall)
+        config.rpc(theirs)
+        assert (calls("listwallets"), calls("loadwallet")) == (
+            before[0] + 1,
+            before[1] + 2,
+        )
+
+        # Only wallets we loaded, and aren't using, are unloaded.
+        time.sleep(0.2)
+        rpcw.getwalletinfo()
+        main._unload_idle_wallets(0.1)
+        assert node.wallets == {wall.name, theirs.name}
+        assert config.rpc(wall) is rpcw
+
+        config.rpc(other).getwalletinfo()
+        assert other.name in node.wallets
+        assert calls("loadwallet") == before[1] + 3
+
+        # A wallet used after being found idle is left loaded.
+        time.sleep(0.2)
+        [key] = [k for k in main._wallet_sessions.idle(0.1) if k[1] == other.name]
+        config.rpc(other).getwalletinfo()
+        assert not main._wallet_sessions.unload_if_idle(key, 0.1, lambda ps: None)
+
+        # Other threads get connections while a wallet is slow to load.
+        loading = threading.Event()
+        release = threading.Event()
+        load = node.rpc_loadwallet
+
+        def slow_load(name, *args):
+            loading.set()
+            release.wait(5)
+            return load(name, *args)
+
+        node.rpc_loadwallet = slow_load
+        slow = replace(wall, fingerprint="22222222")
+        th = threading.Thread(target=config.rpc, args=(slow,))
+        th.start()
+        try:
+            assert loading.wait(5)
+            start = time.monotonic()
+            main.get_rpc(node.url, net_name="mainnet")
+            assert time.monotonic() - start < 1
+        finally:
+            release.set()
+            th.join()
+        assert slow.name in node.wallets
+
+
+def test_wallet_reloaded_when_forgotten():
+    with FakeBitcoind(num_utxos=3) as node, environment(node.url):
+        config, (wall, *_) = main._get_config_required()
+        rpcw = config.rpc(wall)
+        rpcw.getwalletinfo()
+
+        # As if bitcoind restarted, or someone else unloaded the wallet.
+        node.wallets.discard(wall.name)
+        with pytest.raises(main.JSONRPCError) as e:
+            main.BitcoinRPC(node.url, wallet_name=wall.name).getwalletinfo()
+        assert e.value.error["code"] == main.RPC_WALLET_NOT_FOUND
+        assert rpcw.getwalletinfo()["txcount"] == node._txcount
+        assert wall.name in node.wallets
+
+        node.wallets.discard(wall.name)
+        [got] = rpcw.batch([("getwalletinfo",)])
+        assert not isinstance(got, main.JSONRPCError)
+
+        node.wallets.discard(wall.name)
+        assert len(list(rpcw.stream("listunspent", 0))) == 3
+        assert config.rpc(wall) is rpcw
+
+        # Other errors aren't retried.
+        loads = node.calls["loadwallet"]
+        with pytest.raises(main.JSONRPCError):
+            rpcw.nosuchmethod()
+        assert node.calls["nosuchmethod"] == 1
+        assert node.calls["loadwallet"] == loads
+
+
+def test_watch_metrics():
+    def rpc_calls():
+        return sum(m.calls for m in main.default_rpc_stats.methods.values())
+
+    with FakeBitcoind(num_utxos=5) as node, environment(node.url):
+        main._enable_rpc_cache()
+        config, (wall, *_) = main._get_config_required()
+        rpcw = config.rpc(wall)
+        metrics = main.WatchMetrics(wall.name)
+        server = main.serve_metrics(metrics, 0)
+        node.add_utxos(2, confirmations=0)
+
+        stop = threading.Event()
+        th = threading.Thread(target=main._watch, args=(rpcw, stop, metrics))
+        th.start()
+        try:
+            while metrics.last_poll is None:
+                stop.wait(0.01)
+            # Hold the loop still so that only the scrape could make RPCs.
+            stop.set()
+            th.join()
+            before = rpc_calls()
+            url = f"http://127.0.0.1:{server.server_port}/metrics"
+            with urllib.request.urlopen(url) as resp:
+                text = resp.read().decode()
+            assert rpc_calls() == before
+        finally:
+            stop.set()
+            th.join()
+            server.shutdown()
+            main._rpc_cache = None
+
+    unconfirmed = sum(1 for u in node.utxos.values() if not u["confirmations"])
+    lines = text.splitlines()
+    label = f'{{wallet="{wall.name}"}}'
+    assert f"coldcore_wallet_utxos{label} 7" in lines
+    assert f"coldcore_wallet_unconfirmed_utxos{label} {unconfirmed}" in lines
+    assert f"coldcore_best_block_height {node.height}" in lines
+    assert "# TYPE coldcore_poll_duration_seconds histogram" in lines
+    buckets = text.count('coldcore_rpc_latency_seconds_bucket{method="listunspent",')
+    assert buckets == len(LATENCY_BUCKETS)
+    assert 'coldcore_rpc_latency_seconds_bucket{method="listunspent",le="+Inf"}' in text
+    assert 'le="inf"' not in text
+    assert any(line.startswith("coldcore_seconds_since_last_poll ") for line in lines)
+
+
+def test_watch_survives_failed_polls(monkeypatch):
+    get_utxos = main.get_utxos
+    down = threading.Event()
+
+    def flaky_get_utxos(rpcw):
+        if down.is_set():
+            raise ConnectionRefusedError
+        return get_utxos(rpcw)
+
+    monkeypatch.setattr(main, "get_utxos", flaky_get_utxos)
+
+    with FakeBitcoind(num_utxos=5) as node, environment(node.url):
+        config, (wall, *_) = main._get_config_required()
+        metrics = main.WatchMetrics(wall.name)
+        server = main.serve_metrics(metrics, 0)
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+
+        def since_last_poll():
+            with urllib.request.urlopen(url) as resp:
+                [line] = [
+                    line
+                    for line in resp.read().decode().splitlines()
+                    if line.startswith("coldcore_seconds_since_last_poll ")
+                ]
+            return float(line.split()[1])
+
+        stop = threading.Event()
+        args = (config.rpc(wall), stop, metrics)
+        th = threading.Thread(target=main._watch, args=args)
+        th.start()
+        try:
+            while metrics.last_poll is None:
+                stop.wait(0.01)
+            down.set()
+            stop.wait(0.3)
+            stale = since_last_poll()
+            stop.wait(0.5)
+            assert th.is_alive()
+            assert since_last_poll() > stale
+
+            # Polling resumes once bitcoind is back.
+            last_poll = metrics.last_poll
+            down.clear()
+            deadline = time.monotonic() + 5
+            while metrics.last_poll == last_poll and time.monotonic() < deadline:
+                stop.wait(0.05)
+            assert metrics.last_poll != last_poll
+        finally:
+            stop.set()
+            th.join()
+            server.shutdown()
+
+
+def test_daemon(tmp_path, monkeypatch):
+    sock = tmp_path / "daemon.sock"
+    monkeypatch.setenv("COLDCORE_SOCKET", str(sock))
+
+    with FakeBitcoind(num_utxos=5) as node, environment(node.url):
+        server = main.start_daemon(sock)
+        th = threading.Thread(target=server.serve_forever)
+        th.start()
+        try:
+            assert stat.S_IMODE(sock.stat().st_mode) == 0o600
+            conf = main._config_path(absolute=True)
+            loaded = main._loaded_configs[conf][1]
+
+            def request(*argv, config=conf):
+                req = {"argv": list(argv), "cwd": str(tmp_path), "config": config}
+                return main._daemon_request(sock, req)
+
+            resp = request("balance")
+            assert resp["code"] == 0
+            assert resp["stdout"].count("\n") == len(node.utxos) + 1
+
+            resp = request("newaddr", "--num", "2")
+            assert (resp["code"], len(resp["stdout"].split())) == (0, 2)
+            # Later commands are served from the config held in memory...
+            assert main._loaded_configs[conf][1] is loaded
+
+            # ...until the file changes.
+            with open(conf, "a") as f:
+                f.write("\n# edited\n")
+            assert request("balance")["code"] == 0
+            assert main._loaded_configs[conf][1] is not loaded
+
+            assert request("balance", config="/elsewhere.ini") == {"fallback": True}
+            assert request("rpc-stats") == {"fallback": True}
+            assert request("no-such-command")["code"] == 2
+
+            argv = ["--config", conf, "balance"]
+            monkeypatch.setattr(main.sys, "argv", ["coldcore", *argv])
+            main.cli.parse_for_run(argv)
+            assert main._run_in_daemon("balance") == 0
+            main.cli.args.no_daemon = True
+            assert main._run_in_daemon("balance") is None
+
+            # The wallet is loaded again if bitcoind forgets it...
+            wall = main._loaded_configs[conf][1][1][0]
+            node.wallets.discard(wall.name)
+            assert request("newaddr")["code"] == 0
+            assert wall.name in node.wallets
+
+            # ...and if that doesn't take, the client runs the command itself.
+            node.wallets.discard(wall.name)
+            monkeypatch.setattr(node, "rpc_loadwallet", lambda name, *args: {})
+            assert request("newaddr") == {"fallback": True}
+
+            os.remove(conf)
+            assert request("balance")["code"] == 1
+        finally:
+            server.shutdown()
+            th.join()
+            server.server_close()
+            main._loaded_configs = None
+            main._rpc_cache = None
+
+    assert main._daemon_request(sock, {}) is None
@@ -0,0 +1,42 @@
+from . import ui
+from .render_bench import VirtualScreen, render_frames, run_render_benchmarks
+
+
+def test_render_frames():
+    frames = render_frames("dashboard", utxos=20, frames=12, block_every=5)
+
+    assert len(frames) == 12
+    assert all(f.cpu > 0 and f.bytes_out > 0 for f in frames)
+    assert all(f.peak_alloc == 0 for f in frames)
+    assert not ui.stop_threads_event.is_set()
+
+    frames = render_frames("home", frames=3, trace_allocs=True)
+    assert len(frames) == 3
+    assert all(f.peak_alloc > 0 for f in frames)
+
+
+def test_run_render_benchmarks():
+    results = run_render_benchmarks(sizes=[10], frames=3)
+    assert results.keys() == {"home", "dashboard[10]"}
+    assert results["dashboard[10]"]["addstr_bytes"] > results["home"]["addstr_bytes"]
+
+
+def test_virtual_screen():
+    scr = VirtualScreen(10, 20)
+    win = scr.derwin(5, 8, 1, 1)
+    ui._s(win, 0, 2, "a long line of text")
+    scr.addstr(3, 18, "two\nlines")
+
+    assert scr.text()[:5] == ["", "   a long", "", "                  tw", "lines"]
+    first = scr.flush()
+    assert first > len("a longtwlines")
+
+    # Only changes are written...
+    assert scr.flush() == 0
+    scr.addstr(9, 0, "x")
+    assert 0 < scr.flush() < first
+
+    # ...unless the screen was cleared.
+    scr.clear()
+    scr.addstr(9, 0, "x")
+    assert scr.flush() > 0
@@ -0,0 +1,18 @@
+from . import ui
+from .soak import run_soak, growth_per_hour
+
+
+def test_soak_runs():
+    result = run_soak(duration=1, sample_interval=0.4, block_interval=0.2)
+
+    assert not result.errors
+    assert len(result.samples) >= 3
+    assert all(s.traced > 0 for s in result.samples)
+    assert not ui.stop_threads_event.is_set()
+
+
+def test_growth_per_hour():
+    assert growth_per_hour([(0, 0), (1, 1), (2, 2)]) == 3600
+    assert growth_per_hour([(0, 5), (1, 5)]) == 0
+    assert growth_per_hour([(0, 5)]) == 0
+
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from . import ui
+from .render_bench import VirtualScreen, _headless
+
+
+def test_perf_overlay():
+    utxos = ui.PollerStatus("utxos")
+    utxos.succeeded()
+    blocks = ui.PollerStatus("blocks")
+    blocks.failed()
+    blocks.thread = threading.Thread(target=lambda: None)
+    blocks.thread.start()
+    blocks.thread.join()
+
+    overlay = ui.PerfOverlay()
+    scr = VirtualScreen(30, 100)
+    overlay.start_frame()
+    time.sleep(0.01)
+    overlay.end_frame(scr, [utxos, blocks])
+    assert overlay.frame_times[0] >= 0.01
+    # Hidden until toggled.
+    assert not any("performance" in line for line in scr.text())
+
+    overlay.visible = True
+    overlay.end_frame(scr, [utxos, blocks])
+    text = "\n".join(scr.text())
+    assert " performance " in text
+    assert "utxos    sleeping 0.0s old" in text
+    assert "blocks   stopped  no data (1 errs)" in text
+
+
+def test_perf_overlay_toggle():
+    scr = VirtualScreen(40, 120, keys=[ord("p"), ord("q")])
+    with _headless():
+        ui.draw_menu(scr, None, [], None, ui.GoHome)
+    assert any("performance" in line for line in scr.text())
+
+
+def test_scantxoutset_failure_is_left_for_setup():
+    class Down:
+        def scantxoutset(self, *args):
+            raise ConnectionRefusedError
+
+    result = {}  # type: ignore
+    ui._run_scantxoutset(Down(), ("start", []), result)
+    assert result == {}
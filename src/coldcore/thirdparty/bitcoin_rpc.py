@@ -14,26 +14,99 @@
 import logging
 import os
 import base64
+import codecs
+import contextlib
+import gzip
 import http.client as httplib
 import json
-import platform
 import urllib.parse as urlparse
 import socket
 import re
+import reprlib
+import select
+import sys
 import time
+import threading
 import http.client
 import typing as t
+from collections import OrderedDict, deque
 from typing import IO, Optional as Op
 from decimal import Decimal
 
 DEFAULT_USER_AGENT = "AuthServiceProxy/0.1"
 DEFAULT_HTTP_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 8
+
+# bitcoind services RPCs with `-rpcthreads` (default 4) workers and rejects
+# requests beyond `-rpcworkqueue` (default 16), so there's no point in having more
+# than that in flight at once.
+DEFAULT_ASYNC_CONCURRENCY = 16
+
+# Timeouts, in seconds, for calls that are expected to take longer than the
+# proxy's default `timeout` (which interactive calls should fit well inside).
+# None means wait indefinitely.
+DEFAULT_METHOD_TIMEOUTS: t.Dict[str, Op[float]] = {
+    "scantxoutset": 60 * 60,
+    "rescanblockchain": None,
+    "importmulti": 60 * 10,
+    "loadwallet": 60 * 2,
+    "createwallet": 60 * 2,
+    "listunspent": 60 * 2,
+}
+
+# Consecutive connection failures (or "node is starting up" responses) after
+# which calls to a host fail fast, and for how long.
+BREAKER_THRESHOLD = 3
+BREAKER_RESET_AFTER = 5.0
+
+# bitcoind returns this while loading the block index, verifying blocks, etc.
+RPC_IN_WARMUP = -28
 
 
 logger = logging.getLogger("rpc")
-logger.setLevel(logging.DEBUG)
 # logger.addHandler(logging.StreamHandler())
 
+# Caps on how much of an RPC request or response is logged: long containers and
+# strings are elided, and the whole is cut off at LOG_PAYLOAD_CHARS.
+LOG_PAYLOAD_CHARS = 2000
+
+
+class _LogRepr(reprlib.Repr):
+    """Notes how many items long lists and dicts had."""
+
+    def repr_list(self, x, level):
+        s = super().repr_list(x, level)
+        return f"{s} ({len(x)} items)" if len(x) > self.maxlist else s
+
+    def repr_dict(self, x, level):
+        s = super().repr_dict(x, level)
+        return f"{s} ({len(x)} items)" if len(x) > self.maxdict else s
+
+
+_log_repr = _LogRepr()
+_log_repr.maxlevel = 4
+_log_repr.maxlist = _log_repr.maxtuple = _log_repr.maxdict = 8
+_log_repr.maxstring = _log_repr.maxother = 160
+
+
+class _Payload(object):
+    """
+    An RPC request or response to log, abbreviated (see LOG_PAYLOAD_CHARS). It's
+    only formatted if a handler actually emits the message, so passing one as a
+    logging argument costs next to nothing when debug logging is off.
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        s = _log_repr.repr(self.obj)
+        if len(s) > LOG_PAYLOAD_CHARS:
+            s = f"{s[:LOG_PAYLOAD_CHARS]}... ({len(s)} chars)"
+        return s
+
 
 class JSONRPCError(Exception):
     """JSON-RPC protocol error base class
@@ -48,9 +121,1146 @@ class JSONRPCError(Exception):
         self.error = rpc_error
 
 
+class RPCUnavailableError(JSONRPCError):
+    """Raised without contacting the node when recent calls to it have failed."""
+
+    def __init__(self, reason: str):
+        super(RPCUnavailableError, self).__init__(
+            {"code": -346, "message": f"bitcoind unavailable ({reason})"}
+        )
+
+
+SATS_PER_BTC = 100_000_000
+
+
+class Amount(int):
+    """
+    An amount of bitcoin as an integer number of satoshis.
+
+    Sorting, comparison, and arithmetic happen at int speed (and, as with `bool`,
+    arithmetic returns plain ints - wrap totals with `Amount(...)`). The value is
+    rendered in BTC only when formatted with str() or an f-string.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_btc(cls, btc: t.Union[Decimal, str, int]) -> "Amount":
+        sats = Decimal(btc).scaleb(8)
+        if sats != sats.to_integral_value():
+            raise ValueError(f"amount has sub-satoshi precision: {btc}")
+        return cls(int(sats))
+
+    @property
+    def btc(self) -> Decimal:
+        return Decimal(int(self)).scaleb(-8)
+
+    def __str__(self) -> str:
+        whole, frac = divmod(abs(int(self)), SATS_PER_BTC)
+        return f"{'-' if self < 0 else ''}{whole}.{frac:08d}"
+
+    def __format__(self, spec: str) -> str:
+        return format(str(self), spec)
+
+    def __repr__(self) -> str:
+        return f"Amount({int(self)})"
+
+
+# Fields that hold BTC amounts in RPC results (listunspent, scantxoutset,
+# decoderawtransaction, decodepsbt, walletcreatefundedpsbt, getbalances, ...).
+AMOUNT_FIELDS = frozenset(
+    [
+        "amount",
+        "balance",
+        "fee",
+        "immature",
+        "immature_balance",
+        "total_amount",
+        "trusted",
+        "unconfirmed_balance",
+        "untrusted_pending",
+        "value",
+    ]
+)
+
+
+def _amounts_to_sats(obj: t.Dict) -> t.Dict:
+    """A JSON object_hook that converts BTC amount fields to `Amount`s."""
+    for k in AMOUNT_FIELDS.intersection(obj):
+        v = obj[k]
+        if isinstance(v, Decimal):
+            obj[k] = Amount.from_btc(v)
+    return obj
+
+
+# Upper bounds, in seconds, of latency histogram buckets.
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    float("inf"),
+)
+
+# The phases of an RPC that are timed separately.
+PHASES = ("connect", "send", "wait", "read", "decode")
+
+
+class Histogram(object):
+    """A fixed-bucket latency histogram."""
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, secs: float):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if secs <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += secs
+        self.max = max(self.max, secs)
+
+    def percentile(self, pct: float) -> float:
+        """Estimate a percentile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        target = self.count * pct / 100
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    @classmethod
+    def from_dict(cls, d: t.Dict) -> "Histogram":
+        h = cls()
+        h.count = d["count"]
+        h.sum = d["sum"]
+        h.max = d["max"]
+        h.counts = [n for (_, n) in d["buckets"]]
+        return h
+
+    def as_dict(self) -> t.Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "buckets": list(zip(LATENCY_BUCKETS, self.counts)),
+        }
+
+
+class _CallTiming(object):
+    """Measurements for a single RPC, filled in as it progresses."""
+
+    __slots__ = ("start", "phases", "retries", "bytes_sent", "bytes_received")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: t.Dict[str, float] = {}
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def mark(self, phase: str, since: float) -> float:
+        """Add the time elapsed since `since` to `phase`; return the current time."""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - since)
+        return now
+
+
+class MethodStats(object):
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        # Error code (or exception name, for transport errors) -> count.
+        self.errors: t.Dict[str, int] = {}
+        self.latency = Histogram()
+        self.phases = {p: Histogram() for p in PHASES}
+
+    def as_dict(self) -> t.Dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "errors": dict(self.errors),
+            "latency": self.latency.as_dict(),
+            "phases": {p: h.as_dict() for p, h in self.phases.items() if h.count},
+        }
+
+
+class RPCStats(object):
+    """
+    Per-method RPC counters and latency histograms, plus gauges of the calls
+    currently in flight (including those queued for a connection) and the
+    latencies of the most recent calls.
+    """
+
+    RECENT = 256
+
+    def __init__(self):
+        self.methods: t.Dict[str, MethodStats] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.recent: t.Deque[float] = deque(maxlen=self.RECENT)
+        self._lock = threading.Lock()
+
+    def started(self) -> _CallTiming:
+        with self._lock:
+            self.in_flight += 1
+        return _CallTiming()
+
+    def waiting(self, delta: int):
+        """Count calls (not) waiting for their turn to be sent."""
+        with self._lock:
+            self.queued += delta
+
+    def record(self, method: str, timing: _CallTiming, error: Op[BaseException]):
+        elapsed = time.perf_counter() - timing.start
+        with self._lock:
+            self.in_flight -= 1
+            self.recent.append(elapsed)
+            m = self.methods.get(method)
+            if m is None:
+                m = self.methods[method] = MethodStats()
+            m.calls += 1
+            m.retries += timing.retries
+            m.bytes_sent += timing.bytes_sent
+            m.bytes_received += timing.bytes_received
+            m.latency.add(elapsed)
+            for phase, secs in timing.phases.items():
+                m.phases[phase].add(secs)
+            if error is not None:
+                if isinstance(error, JSONRPCError):
+                    code = str(error.error.get("code"))
+                else:
+                    code = type(error).__name__
+                m.errors[code] = m.errors.get(code, 0) + 1
+
+    def as_dict(self) -> t.Dict[str, t.Dict]:
+        with self._lock:
+            return {name: m.as_dict() for name, m in sorted(self.methods.items())}
+
+    def recent_percentiles(self, *pcts: float) -> t.List[float]:
+        """Latency percentiles over the most recent calls."""
+        with self._lock:
+            recent = sorted(self.recent)
+        if not recent:
+            return [0.0 for _ in pcts]
+        return [recent[min(len(recent) - 1, int(len(recent) * p / 100))] for p in pcts]
+
+    def reset(self):
+        with self._lock:
+            self.methods.clear()
+            self.recent.clear()
+
+
+# Used by all proxies unless they're given their own.
+default_rpc_stats = RPCStats()
+
+
+class _CountingReader(object):
+    """Wraps a response to count the bytes read from it, optionally keeping a copy
+    of them in `tee`."""
+
+    def __init__(self, fp, timing: _CallTiming, tee: Op[t.List[bytes]] = None):
+        self.fp = fp
+        self.timing = timing
+        self.tee = tee
+
+    def read(self, n: int = -1) -> bytes:
+        got = self.fp.read(n)
+        self.timing.bytes_received += len(got)
+        if self.tee is not None:
+            self.tee.append(got)
+        return got
+
+
+class RPCRecorder(object):
+    """
+    Records RPC traffic - each request with its raw response and timings - to a
+    gzipped JSON-lines file, which `fake_bitcoind.ReplayBitcoind` can serve back.
+
+    URLs are recorded with credentials redacted, as in `public_url`, and auth
+    headers aren't recorded at all. Responses (addresses, balances, ...) are
+    recorded verbatim, so treat recordings like the wallet they came from.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._fp = gzip.open(path, "wt", encoding="utf8")
+        self._write({"version": self.VERSION, "started": time.time()})
+
+    def _write(self, entry: t.Dict):
+        self._fp.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def record(
+        self,
+        public_url: str,
+        request: str,
+        status: int,
+        response: str,
+        timing: _CallTiming,
+    ):
+        now = time.perf_counter()
+        entry = {
+            # Seconds since recording started that the call was made, and took.
+            "at": round(timing.start - self._start, 6),
+            "elapsed": round(now - timing.start, 6),
+            "url": public_url,
+            "status": status,
+            "request": request,
+            "response": response,
+        }
+        with self._lock:
+            if self._fp.closed:
+                return
+            self._write(entry)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
+
+
+class Tracer(object):
+    """
+    Collects spans - named, timed steps - for export as Chrome trace events, which
+    chrome://tracing or https://ui.perfetto.dev can display.
+
+    Each thread gets its own track, and spans on a track nest by time, so an RPC
+    made during a step shows up beneath it. Calls made concurrently from one
+    thread (by `AsyncRawProxy`) are exported as async events instead, since they
+    overlap.
+
+    A tracer does nothing, cheaply, until `enable()` is called.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events: t.List[t.Dict] = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._pid = os.getpid()
+        self._threads: t.Dict[int, str] = {}
+        # Thread ID -> (name, start) of the step begun with `step()`.
+        self._steps: t.Dict[int, t.Tuple[str, float]] = {}
+        self._next_async_id = 0
+
+    def enable(self):
+        self.enabled = True
+
+    def _ts(self, when: float) -> float:
+        """Microseconds since the tracer was created."""
+        return round((when - self._start) * 1e6, 1)
+
+    def _add(self, *events: t.Dict):
+        th = threading.current_thread()
+        with self._lock:
+            if th.ident not in self._threads:
+                self._threads[th.ident] = th.name  # type: ignore
+            self.events.extend(events)
+
+    def complete(
+        self,
+        name: str,
+        start: float,
+        end: float,
+        cat: str = "step",
+        concurrent: bool = False,
+        **args,
+    ):
+        """Record a span that ran from `start` to `end` (perf_counter times)."""
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "cat": cat,
+            "ts": self._ts(start),
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        if not concurrent:
+            self._add(dict(event, ph="X", dur=round((end - start) * 1e6, 1)))
+            return
+
+        with self._lock:
+            self._next_async_id += 1
+            async_id = self._next_async_id
+        self._add(
+            dict(event, ph="b", id=async_id),
+            dict(event, ph="e", id=async_id, ts=self._ts(end), args={}),
+        )
+
+    @contextlib.contextmanager
+    def span(self, name: str, cat: str = "step", **args):
+        """Record the enclosed block as a span."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            args["error"] = repr(e)
+            raise
+        finally:
+            # Steps begun within the span end with it.
+            step = self._steps.get(threading.get_ident())
+            if step and step[1] >= start:
+                self.step(None)
+            self.complete(name, start, time.perf_counter(), cat, **args)
+
+    def step(self, name: Op[str]):
+        """
+        End this thread's current step, if any, and begin one called `name` (or
+        none, if None); for marking out a long sequence of steps.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        tid = threading.get_ident()
+        prev = self._steps.pop(tid, None)
+        if prev:
+            self.complete(prev[0], prev[1], now)
+        if name:
+            self._steps[tid] = (name, now)
+
+    def rpc(
+        self,
+        method: str,
+        path: str,
+        timing: _CallTiming,
+        error: Op[BaseException],
+        concurrent: bool = False,
+    ):
+        args: t.Dict[str, t.Any] = {
+            "bytes_sent": timing.bytes_sent,
+            "bytes_received": timing.bytes_received,
+        }
+        if path not in ("", "/"):
+            args["path"] = path
+        if timing.retries:
+            args["retries"] = timing.retries
+        for phase, secs in timing.phases.items():
+            args[f"{phase}_ms"] = round(secs * 1000, 3)
+        if error is not None:
+            args["error"] = (
+                error.error.get("code")
+                if isinstance(error, JSONRPCError)
+                else type(error).__name__
+            )
+        self.complete(
+            method, timing.start, time.perf_counter(), "rpc", concurrent, **args
+        )
+
+    def as_dict(self) -> t.Dict:
+        # Close any steps still open, e.g. if we're exiting on an error.
+        for (tid, (name, start)) in list(self._steps.items()):
+            self._add(
+                {
+                    "name": name,
+                    "cat": "step",
+                    "ph": "X",
+                    "ts": self._ts(start),
+                    "dur": round((time.perf_counter() - start) * 1e6, 1),
+                    "pid": self._pid,
+                    "tid": tid,
+                    "args": {"unfinished": True},
+                }
+            )
+        self._steps.clear()
+
+        with self._lock:
+            names = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self._threads.items()
+            ]
+            return {"traceEvents": names + self.events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f)
+
+
+# Used by all proxies unless they're given their own; see `Tracer.enable()`.
+default_tracer = Tracer()
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_result_array(
+    fp: t.IO[bytes], decoder: json.JSONDecoder, req_id: Op[int] = None
+) -> t.Iterator:
+    """
+    Incrementally parse a JSON-RPC response object read from `fp`, yielding the
+    elements of its `result` array one at a time. Only one element (plus one
+    chunk of input) is held in memory at once.
+
+    Since the response ID typically follows the result, a mismatched ID is only
+    detected (and raised) after all elements have been yielded.
+    """
+    utf8 = codecs.getincrementaldecoder("utf8")()
+    buf = ""
+    pos = 0
+    eof = False
+    others: t.Dict[str, t.Any] = {}
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = fp.read(STREAM_CHUNK_SIZE)
+        eof = not chunk
+        # Drop what's already been consumed.
+        buf = buf[pos:] + utf8.decode(chunk, final=eof)
+        pos = 0
+
+    def skip_ws() -> str:
+        """Advance to the next non-whitespace character and return it."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                raise json.JSONDecodeError("unexpected end of response", buf, pos)
+            fill()
+
+    def expect(chars: str) -> str:
+        nonlocal pos
+        c = skip_ws()
+        if c not in chars:
+            raise json.JSONDecodeError(f"expected one of {chars!r}", buf, pos)
+        pos += 1
+        return c
+
+    def value():
+        nonlocal pos
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A number at the end of the buffer may have been cut short (e.g.
+            # "22." parses as 22); make sure a delimiter follows it.
+            if not eof and (end >= len(buf) or buf[end] not in " \t\r\n,]}:"):
+                fill()
+                continue
+            pos = end
+            return obj
+
+    expect("{")
+    if skip_ws() == "}":
+        raise JSONRPCError({"code": -343, "message": "missing JSON-RPC result"})
+
+    while True:
+        skip_ws()
+        key = value()
+        expect(":")
+
+        if key == "result" and skip_ws() == "[":
+            pos += 1
+            others["result"] = []
+            if skip_ws() == "]":
+                pos += 1
+            else:
+                while True:
+                    skip_ws()
+                    yield value()
+                    if expect(",]") == "]":
+                        break
+        else:
+            skip_ws()
+            others[key] = value()
+
+        if expect(",}") == "}":
+            break
+
+    got_id = others.get("id")
+    if req_id is not None and got_id is not None and got_id != req_id:
+        raise JSONRPCError(
+            {"code": -341, "message": f"response ID {got_id!r} doesn't match {req_id!r}"}
+        )
+    elif others.get("error") is not None:
+        raise _error_from_response(others["error"])
+    elif "result" not in others:
+        raise JSONRPCError({"code": -343, "message": "missing JSON-RPC result"})
+    elif not isinstance(others["result"], list):
+        raise JSONRPCError({"code": -343, "message": "JSON-RPC result not an array"})
+
+
+def _error_from_response(err) -> JSONRPCError:
+    if isinstance(err, dict):
+        return JSONRPCError(
+            {
+                "code": err.get("code", -345),
+                "message": err.get("message", "error message not specified"),
+            }
+        )
+    return JSONRPCError({"code": -344, "message": str(err)})
+
+
+# Errors that indicate a kept-alive connection was closed by the server while it
+# sat idle in the pool; retrying on a fresh connection is safe.
+_STALE_CONN_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+class ConnectionPool(object):
+    """A bounded, thread-safe pool of keep-alive HTTP connections to one host.
+
+    Connections are checked out exclusively for the duration of a single
+    request/response exchange, so any number of threads can share a pool.
+    """
+
+    def __init__(self, host: str, port: int, maxsize: int = DEFAULT_POOL_SIZE):
+        self.host = host
+        self.port = port
+        self.maxsize = maxsize
+        self._idle: t.List[httplib.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        # Idle connections found to be closed or half-closed by the server.
+        self.stale = 0
+        # Connections closed on return because the pool was full.
+        self.discarded = 0
+
+    def get(self, timeout) -> t.Tuple[httplib.HTTPConnection, bool]:
+        """
+        Check out a connection. Returns (conn, reused), where `reused` is True if
+        the connection came from the pool.
+        """
+        conn = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if _is_usable(candidate):
+                    self.hits += 1
+                    conn = candidate
+                    break
+                self.stale += 1
+                candidate.close()
+            else:
+                self.misses += 1
+
+        if conn is None:
+            return (
+                httplib.HTTPConnection(self.host, port=self.port, timeout=timeout),
+                False,
+            )
+
+        conn.timeout = timeout
+        conn.sock.settimeout(timeout)
+        return (conn, True)
+
+    def put(self, conn: httplib.HTTPConnection):
+        """Return a connection whose last response has been fully read."""
+        if conn.sock is None:
+            # The server asked us to close the connection.
+            return
+
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(conn)
+                return
+            self.discarded += 1
+        conn.close()
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    @property
+    def stats(self) -> t.Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "discarded": self.discarded,
+                "idle": len(self._idle),
+            }
+
+
+def _is_usable(conn: httplib.HTTPConnection) -> bool:
+    """
+    An idle keep-alive socket should have nothing to read; if it's readable, the
+    server has either closed it (EOF) or sent something we didn't ask for.
+    """
+    if conn.sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+
+_pools: t.Dict[t.Tuple[str, int], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host: str, port: int) -> ConnectionPool:
+    """Get the process-wide connection pool for a given host."""
+    with _pools_lock:
+        if (host, port) not in _pools:
+            _pools[(host, port)] = ConnectionPool(host, port)
+        return _pools[(host, port)]
+
+
+class CircuitBreaker(object):
+    """
+    Fails calls to a node fast while it's down or still starting up, rather
+    than have every caller wait out its own timeout.
+
+    After `threshold` consecutive failures the breaker opens and calls raise
+    RPCUnavailableError. Once `reset_after` seconds have passed, a single trial
+    call is let through: if it succeeds the breaker closes, otherwise it stays
+    open for another `reset_after`.
+    """
+
+    def __init__(
+        self, threshold: int = BREAKER_THRESHOLD, reset_after: float = BREAKER_RESET_AFTER
+    ):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: Op[float] = None
+        self.last_error = ""
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def check(self):
+        """Raise if calls shouldn't currently be attempted."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if (
+                time.monotonic() - self.opened_at < self.reset_after
+                or self._trial_in_flight
+            ):
+                raise RPCUnavailableError(self.last_error)
+            self._trial_in_flight = True
+
+    def record(self, error: Op[BaseException]):
+        """Note the outcome of a call."""
+        if isinstance(error, RPCUnavailableError):
+            return
+        elif isinstance(error, JSONRPCError):
+            failed = error.error.get("code") == RPC_IN_WARMUP
+        elif isinstance(error, (OSError, http.client.HTTPException)):
+            failed = True
+        elif error is None:
+            failed = False
+        else:
+            # e.g. KeyboardInterrupt; says nothing about the node.
+            with self._lock:
+                self._trial_in_flight = False
+            return
+
+        with self._lock:
+            self._trial_in_flight = False
+            if not failed:
+                if self.opened_at is not None:
+                    logger.info("bitcoind is reachable again")
+                self.failures = 0
+                self.opened_at = None
+                return
+
+            self.failures += 1
+            self.last_error = f"{error.__class__.__name__}: {error}"
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.warning(
+                        "%d consecutive RPC failures; failing fast for %ss (%s)",
+                        self.failures,
+                        self.reset_after,
+                        self.last_error,
+                    )
+                self.opened_at = time.monotonic()
+
+
+_breakers: t.Dict[t.Tuple[str, int], CircuitBreaker] = {}
+
+
+def get_circuit_breaker(host: str, port: int) -> CircuitBreaker:
+    """Get the process-wide circuit breaker for a given host."""
+    with _pools_lock:
+        if (host, port) not in _breakers:
+            _breakers[(host, port)] = CircuitBreaker()
+        return _breakers[(host, port)]
+
+
+# bitcoin.conf files and auth cookies, parsed, by path; so that each proxy a
+# process constructs doesn't read them again. Entries are keyed on the file's
+# identity and mtime, so a rewritten file (e.g. the new cookie written when
+# bitcoind restarts) is picked up.
+_conf_files: t.Dict[str, t.Tuple[t.Tuple[int, int, int], t.Any]] = {}
+
+
+def _read_conf_file(
+    path: str, parse: t.Callable[[str], t.Any], fresh: bool = False
+) -> t.Any:
+    """
+    Return `parse(<contents of path>)`, cached unless `fresh`. Raises OSError if
+    the file can't be read.
+    """
+    st = os.stat(path)
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    with _pools_lock:
+        got = _conf_files.get(path)
+    if got and got[0] == key and not fresh:
+        return got[1]
+
+    with open(path, "r") as fd:
+        value = parse(fd.read())
+    with _pools_lock:
+        _conf_files[path] = (key, value)
+    return value
+
+
+def _parse_bitcoind_conf(contents: str) -> t.Dict[str, str]:
+    conf = {}
+    for line in contents.splitlines():
+        if "#" in line:
+            line = line[: line.index("#")]
+        if "=" not in line:
+            continue
+        k, v = line.split("=", 1)
+        conf[k.strip()] = v.strip()
+    return conf
+
+
+# Cache scopes: how long a cached result remains valid.
+#
+# Results that depend only on their params (e.g. decoding a PSBT).
+CACHE_FOREVER = "forever"
+# Results that may change whenever the chain tip changes.
+CACHE_CHAIN = "chain"
+# Results that may change whenever the tip changes or the wallet sees a new
+# transaction (including in the mempool).
+CACHE_WALLET = "wallet"
+
+
+class CachePolicy(t.NamedTuple):
+    scope: str
+    # If given, also expire entries after this many seconds.
+    ttl: Op[float] = None
+
+
+DEFAULT_CACHE_POLICIES: t.Dict[str, CachePolicy] = {
+    "decodepsbt": CachePolicy(CACHE_FOREVER),
+    "decoderawtransaction": CachePolicy(CACHE_FOREVER),
+    "getdescriptorinfo": CachePolicy(CACHE_FOREVER),
+    "getblockstats": CachePolicy(CACHE_CHAIN),
+    "getblockchaininfo": CachePolicy(CACHE_CHAIN),
+    # Peer counts and warnings change independently of the tip.
+    "getnetworkinfo": CachePolicy(CACHE_CHAIN, ttl=10),
+    "listunspent": CachePolicy(CACHE_WALLET, ttl=30),
+    "getwalletinfo": CachePolicy(CACHE_WALLET, ttl=30),
+    "getbalances": CachePolicy(CACHE_WALLET, ttl=30),
+    "listtransactions": CachePolicy(CACHE_WALLET, ttl=30),
+}
+
+
+class _CacheEntry(t.NamedTuple):
+    token: t.Any
+    stored_at: float
+    value: t.Any
+
+
+class RPCCache(object):
+    """
+    An LRU cache of read-only RPC results, shared between proxies.
+
+    Entries are keyed on (node, wallet, method, params) and tagged with a token
+    describing the state they were computed under - the best block hash for
+    CACHE_CHAIN, plus the wallet's transaction count and last processed block
+    for CACHE_WALLET. Tokens are re-probed from the node at most every
+    `refresh_interval` seconds, so a poller hammering `listunspent` costs one
+    `getbestblockhash` and one `getwalletinfo` per interval until something
+    actually changes.
+
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        refresh_interval: float = 1.0,
+        policies: t.Optional[t.Dict[str, CachePolicy]] = None,
+    ):
+        self.maxsize = maxsize
+        self.refresh_interval = refresh_interval
+        self.policies = dict(DEFAULT_CACHE_POLICIES if policies is None else policies)
+        self._entries: "OrderedDict[t.Tuple, _CacheEntry]" = OrderedDict()
+        # (scope, node or wallet) -> (token, time checked)
+        self._tokens: t.Dict[t.Tuple[str, str], t.Tuple[t.Any, float]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.probes = 0
+
+    def get(self, proxy: "BaseProxy", method: str, args: t.Sequence, fetch):
+        """Return a cached result for this call, or `fetch()` and cache it."""
+        policy = self.policies[method]
+        token = self._token(proxy, policy.scope)
+        key = (proxy._cache_namespace, method, _params_key(args))
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry.token == token
+                and (policy.ttl is None or now - entry.stored_at < policy.ttl)
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+
+        value = fetch()
+        self._store(key, token, value)
+        return value
+
+    def peek(self, proxy: "BaseProxy", method: str, args: t.Sequence = ()):
+        """
+        Return whatever result is cached for this call, however stale, without
+        making any requests; None if there isn't one.
+        """
+        key = (proxy._cache_namespace, method, _params_key(args))
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens.clear()
+
+    @property
+    def stats(self) -> t.Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "probes": self.probes,
+                "size": len(self._entries),
+            }
+
+    def _store(self, key: t.Tuple, token, value):
+        with self._lock:
+            self._entries[key] = _CacheEntry(token, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _token(self, proxy: "BaseProxy", scope: str):
+        if scope == CACHE_FOREVER:
+            return None
+
+        chain = self._probe(
+            (CACHE_CHAIN, f"{proxy.host}:{proxy.port}"),
+            lambda: proxy._call_uncached("getbestblockhash"),
+        )
+        if scope == CACHE_CHAIN:
+            return chain
+
+        def probe_wallet():
+            info = proxy._call_uncached("getwalletinfo")
+            token = (
+                chain,
+                info.get("txcount"),
+                (info.get("lastprocessedblock") or {}).get("hash"),
+            )
+            # We have the answer to a getwalletinfo call in hand, so cache it.
+            self._store((proxy._cache_namespace, "getwalletinfo", "[]"), token, info)
+            return token
+
+        return self._probe((CACHE_WALLET, proxy._cache_namespace), probe_wallet)
+
+    def _probe(self, key: t.Tuple[str, str], fetch):
+        now = time.monotonic()
+        with self._lock:
+            got = self._tokens.get(key)
+            if got and now - got[1] < self.refresh_interval:
+                return got[0]
+            self.probes += 1
+
+        token = fetch()
+        with self._lock:
+            self._tokens[key] = (token, now)
+        return token
+
+
+def _params_key(args: t.Sequence) -> str:
+    return json.dumps(args, sort_keys=True, default=str)
+
+
+# Calls with no side effects, which can safely share a single in-flight request.
+READ_ONLY_METHODS = frozenset(
+    [
+        "decodepsbt",
+        "decoderawtransaction",
+        "estimatesmartfee",
+        "getaddressinfo",
+        "getbalances",
+        "getbestblockhash",
+        "getblock",
+        "getblockchaininfo",
+        "getblockcount",
+        "getblockhash",
+        "getblockheader",
+        "getblockstats",
+        "getdescriptorinfo",
+        "getmempoolinfo",
+        "getnetworkinfo",
+        "getwalletinfo",
+        "help",
+        "listtransactions",
+        "listunspent",
+        "listwallets",
+    ]
+)
+
+
+class _Flight(object):
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: t.Any = None
+        self.error: Op[BaseException] = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent identical calls: while a call for some key is in flight,
+    other callers with the same key wait for and share its result (or error)
+    rather than making their own.
+    """
+
+    def __init__(self):
+        self._flights: t.Dict[t.Tuple, _Flight] = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced = 0
+        # Callers currently waiting on another's call.
+        self.waiting = 0
+        # Method name -> number of calls coalesced.
+        self.coalesced_by_method: t.Dict[str, int] = {}
+
+    def do(self, key: t.Tuple, method: str, fetch):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                self.coalesced_by_method[method] = (
+                    self.coalesced_by_method.get(method, 0) + 1
+                )
+                leader = False
+
+        if not leader:
+            with self._lock:
+                self.waiting += 1
+            try:
+                flight.done.wait()
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+        return flight.result
+
+    @property
+    def stats(self) -> t.Dict:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_by_method": dict(self.coalesced_by_method),
+                "in_flight": len(self._flights),
+                "coalesced_waiting": self.waiting,
+            }
+
+
+# Used by all proxies unless they're given their own.
+default_single_flight = SingleFlight()
+
+
 class BaseProxy(object):
     """Base JSON-RPC proxy class. Contains only private methods; do not use
-    directly."""
+    directly.
+
+    Proxies are safe to share between threads: request IDs are allocated
+    atomically, each call checks out its own connection from the pool, and
+    responses are matched against the ID of the request that was sent.
+    """
 
     def __init__(
         self,
@@ -61,21 +1271,45 @@ class BaseProxy(object):
         timeout=DEFAULT_HTTP_TIMEOUT,
         debug_stream: Op[IO] = None,
         wallet_name=None,
+        cache: Op[RPCCache] = None,
+        stats: Op[RPCStats] = None,
+        single_flight: Op[SingleFlight] = None,
+        sat_amounts: bool = False,
+        method_timeouts: Op[t.Dict[str, Op[float]]] = None,
+        recorder: Op[RPCRecorder] = None,
+        tracer: Op[Tracer] = None,
     ):
 
         self.debug_stream = debug_stream
+        self.recorder = recorder
+        self.tracer = tracer or default_tracer
+        self.cache = cache
+        self.stats = stats or default_rpc_stats
+        self.single_flight = single_flight or default_single_flight
+
+        # If set, decode BTC amounts in results straight to integer-satoshi
+        # `Amount`s.
+        self.sat_amounts = sat_amounts
+        self._decoder = json.JSONDecoder(
+            parse_float=Decimal, object_hook=(_amounts_to_sats if sat_amounts else None)
+        )
         authpair = None
         net_name = net_name or "mainnet"
+        # The default timeout; see also `timeout_for()`.
         self.timeout = timeout
+        self.method_timeouts = dict(DEFAULT_METHOD_TIMEOUTS, **(method_timeouts or {}))
         self.net_name = net_name
+        # If auth came from the cookie file, where to find it again when
+        # bitcoind restarts and writes a new one.
+        self._cookie_source: Op[t.Tuple[dict, str, str]] = None
 
         # Figure out the path to the bitcoin.conf file
         if btc_conf_file is None:
-            if platform.system() == "Darwin":
+            if sys.platform == "darwin":
                 btc_conf_file = os.path.expanduser(
                     "~/Library/Application Support/Bitcoin/"
                 )
-            elif platform.system() == "Windows":
+            elif sys.platform == "win32":
                 btc_conf_file = os.path.join(os.environ["APPDATA"], "Bitcoin")
             else:
                 btc_conf_file = os.path.expanduser("~/.bitcoin")
@@ -95,6 +1329,7 @@ class BaseProxy(object):
             service_url = f"http://{conf['rpchost']}:{conf['rpcport']}"
 
             authpair = self._get_bitcoind_cookie_authpair(conf, btc_conf_file, net_name)
+            self._cookie_source = (conf, btc_conf_file, net_name)
         else:
             url = urlparse.urlparse(service_url)
             authpair = "%s:%s" % (url.username or "", url.password or "")
@@ -111,13 +1346,13 @@ class BaseProxy(object):
                 authpair = self._get_bitcoind_cookie_authpair(
                     conf, btc_conf_file, net_name
                 )
+                self._cookie_source = (conf, btc_conf_file, net_name)
                 logger.debug("pulling authpair from cookie despite intaking URL")
 
         if wallet_name:
             service_url = service_url.rstrip("/")
             service_url += f"/wallet/{wallet_name}"
 
-        logger.info(f"Connecting to bitcoind: {service_url}")
         self.url = service_url
 
         # Credential redacted
@@ -125,32 +1360,57 @@ class BaseProxy(object):
         self._parsed_url = urlparse.urlparse(service_url)
         self.host = self._parsed_url.hostname
 
-        logger.info(f"Initializing RPC client at {self.public_url}")
+        logger.debug("Initializing RPC client at %s", self.public_url)
         # XXX keep for debugging, but don't ship:
         # logger.info(f"[REMOVE THIS] USING AUTHPAIR {authpair}")
 
         if self._parsed_url.scheme not in ("http",):
             raise ValueError("Unsupported URL scheme %r" % self._parsed_url.scheme)
 
+        # When (by time.monotonic()) this proxy last made a request, if ever.
+        self.last_call: Op[float] = None
+
+        # Shared by every thread using this proxy.
         self.__id_count = 0
+        self.__id_lock = threading.Lock()
+        # Proxies to the same host (e.g. different wallets) share connections.
+        self._pool = get_pool(self.host, self.port)
+        self._breaker = get_circuit_breaker(self.host, self.port)
+        self._cache_namespace = f"{self.host}:{self.port}{self._parsed_url.path}"
+        if sat_amounts:
+            # Results are decoded differently, so mustn't be shared.
+            self._cache_namespace += "#sats"
 
-        self.__auth_header = None
+        self._auth_header = None
         if authpair:
-            self.__auth_header = b"Basic " + base64.b64encode(authpair.encode("utf8"))
+            self._set_authpair(authpair)
+
+    def _set_authpair(self, authpair: str):
+        self._auth_header = b"Basic " + base64.b64encode(authpair.encode("utf8"))
+
+    def _reread_cookie(self) -> bool:
+        """
+        Pick up new credentials after bitcoind has restarted. Returns True if
+        they changed.
+        """
+        if not self._cookie_source:
+            return False
+        old = self._auth_header
+        try:
+            self._set_authpair(
+                self._get_bitcoind_cookie_authpair(*self._cookie_source, fresh=True)
+            )
+        except ValueError:
+            return False
+        logger.info("[%s] re-read auth cookie", self.public_url)
+        return self._auth_header != old
 
     def _get_bitcoind_conf_from_filesystem(self, btc_conf_file: str) -> t.Dict:
         conf = {"rpcuser": ""}
 
         # Extract contents of bitcoin.conf to build service_url
         try:
-            with open(btc_conf_file, "r") as fd:
-                for line in fd.readlines():
-                    if "#" in line:
-                        line = line[: line.index("#")]
-                    if "=" not in line:
-                        continue
-                    k, v = line.split("=", 1)
-                    conf[k.strip()] = v.strip()
+            conf.update(_read_conf_file(btc_conf_file, _parse_bitcoind_conf))
 
         # Treat a missing bitcoin.conf as though it were empty
         except FileNotFoundError:
@@ -159,7 +1419,7 @@ class BaseProxy(object):
         return conf
 
     def _get_bitcoind_cookie_authpair(
-        self, conf: dict, btc_conf_file: str, net_name: str
+        self, conf: dict, btc_conf_file: str, net_name: str, fresh: bool = False
     ) -> t.Optional[str]:
         """Get an authpair from the cookie or configuration files."""
         authpair = ""
@@ -168,9 +1428,10 @@ class BaseProxy(object):
             cookie_dir = os.path.join(cookie_dir, net_name)
         cookie_file = os.path.join(cookie_dir, ".cookie")
         try:
-            with open(cookie_file, "r") as fd:
-                authpair = fd.read()
-                logger.debug("read authpair from cookie")
+            # Mtimes can be coarse, so when the cookie is known to be stale,
+            # don't trust the cache to notice.
+            authpair = _read_conf_file(cookie_file, str, fresh)
+            logger.debug("read authpair from cookie")
         except (IOError, FileNotFoundError) as err:
             logger.debug("couldn't read authpair from cookie", exc_info=True)
             if "rpcpassword" in conf:
@@ -191,90 +1452,406 @@ class BaseProxy(object):
         else:
             return self._parsed_url.port
 
-    def _getconn(self):
-        return httplib.HTTPConnection(
-            self._parsed_url.hostname, port=self.port, timeout=self.timeout
-        )
+    @property
+    def pool_stats(self) -> t.Dict[str, int]:
+        """Hit/miss counters for the connection pool this proxy draws from."""
+        return self._pool.stats
 
-    def _call(self, service_name, *args):
-        self.__id_count += 1
+    def timeout_for(self, *methods: str) -> Op[float]:
+        """The timeout for a call (or batch of calls) to `methods`."""
+        timeouts = [self.method_timeouts.get(m, self.timeout) for m in methods]
+        if None in timeouts:
+            return None
+        return max(timeouts, default=self.timeout)
 
-        postdata = json.dumps(
-            {
-                "version": "1.1",
-                "method": service_name,
-                "params": args,
-                "id": self.__id_count,
-            }
-        )
+    # Whether calls can overlap on one thread, for tracing.
+    _concurrent = False
+
+    def _record(self, name: str, timing: _CallTiming, error: Op[BaseException]):
+        self.last_call = time.monotonic()
+        self.stats.record(name, timing, error)
+        self._breaker.record(error)
+        if self.tracer.enabled:
+            self.tracer.rpc(
+                name, self._parsed_url.path, timing, error, self._concurrent
+            )
 
-        logger.debug(f"[{self.public_url}] calling %s%s", service_name, args)
+    def _next_id(self) -> int:
+        with self.__id_lock:
+            self.__id_count += 1
+            return self.__id_count
 
+    def _request(self, service_name, args) -> t.Dict:
+        return {
+            "version": "1.1",
+            "method": service_name,
+            "params": args,
+            "id": self._next_id(),
+        }
+
+    def _headers(self) -> t.Dict:
         headers = {
             "Host": self._parsed_url.hostname,
             "User-Agent": DEFAULT_USER_AGENT,
             "Content-type": "application/json",
         }
 
-        if self.__auth_header is not None:
-            headers["Authorization"] = self.__auth_header
+        if self._auth_header is not None:
+            headers["Authorization"] = self._auth_header
+
+        return headers
+
+    def _call(self, service_name, *args):
+        def fetch():
+            return self._coalesced(
+                service_name, args, lambda: self._call_uncached(service_name, *args)
+            )
+
+        if self.cache is not None and service_name in self.cache.policies:
+            return self.cache.get(self, service_name, args, fetch)
+        return fetch()
+
+    def _coalesced(self, service_name, args, fetch):
+        """Share the result of concurrent, identical read-only calls."""
+        if service_name not in READ_ONLY_METHODS:
+            return fetch()
+        key = (self._cache_namespace, service_name, _params_key(args))
+        return self.single_flight.do(key, service_name, fetch)
+
+    def _call_uncached(self, service_name, *args):
+        req = self._request(service_name, args)
+        postdata = json.dumps(req)
+
+        logger.debug("[%s] calling %s%s", self.public_url, service_name, _Payload(args))
+
+        timing = self.stats.started()
+        error = None
+        try:
+            return self._unpack(
+                self._post(
+                    postdata,
+                    timing,
+                    self.timeout_for(service_name),
+                    idempotent=service_name in READ_ONLY_METHODS,
+                ),
+                req["id"],
+            )
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._record(service_name, timing, error)
+
+    def _batch(self, calls: t.Sequence[t.Sequence]) -> t.List:
+        """
+        Send a number of calls, each a sequence of `(method, *args)`, in a single
+        JSON-RPC batch request.
+
+        Returns a list with one entry per call, in order: either the call's result
+        or the JSONRPCError it produced. Errors affecting the whole batch are
+        raised.
+        """
+        if not calls:
+            return []
+
+        reqs = [self._request(service_name, args) for (service_name, *args) in calls]
+
+        logger.debug("[%s] calling batch of %d", self.public_url, len(reqs))
+
+        timing = self.stats.started()
+        timeout = self.timeout_for(*(r["method"] for r in reqs))
+        idempotent = all(r["method"] in READ_ONLY_METHODS for r in reqs)
+        error = None
+        try:
+            return self._unpack_batch(
+                reqs, self._post(json.dumps(reqs), timing, timeout, idempotent)
+            )
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._record("batch", timing, error)
+
+    def _unpack(self, response, req_id: Op[int] = None):
+        got_id = response.get("id")
+        if req_id is not None and got_id is not None and got_id != req_id:
+            # We've been handed someone else's response; something is badly wrong
+            # with the connection.
+            raise JSONRPCError(
+                {
+                    "code": -341,
+                    "message": f"response ID {got_id!r} doesn't match {req_id!r}",
+                }
+            )
+
+        err = response.get("error")
+        if err is not None:
+            raise _error_from_response(err)
+        elif "result" not in response:
+            raise JSONRPCError({"code": -343, "message": "missing JSON-RPC result"})
+        else:
+            return response["result"]
+
+    def _unpack_batch(self, reqs: t.List[t.Dict], response) -> t.List:
+        if isinstance(response, dict):
+            # The server rejected the batch as a whole.
+            err = response.get("error")
+            raise _error_from_response(err or "unexpected batch response")
+
+        by_id = {r.get("id"): r for r in response if isinstance(r, dict)}
+        results: t.List = []
+
+        for req in reqs:
+            got = by_id.get(req["id"])
+            if got is None:
+                results.append(
+                    JSONRPCError({"code": -343, "message": "missing JSON-RPC result"})
+                )
+                continue
+            try:
+                results.append(self._unpack(got, req["id"]))
+            except JSONRPCError as e:
+                results.append(e)
+
+        return results
+
+    def _stream(self, service_name, *args) -> t.Iterator:
+        """
+        Like `_call`, but for calls that return an array: yield each element of
+        the result as it is parsed off of the socket rather than decoding the whole
+        response at once.
+
+        When caching applies to the method, the result is collected and cached
+        instead.
+        """
+        if self.cache is not None and service_name in self.cache.policies:
+            yield from self.cache.get(
+                self,
+                service_name,
+                args,
+                lambda: self._coalesced(
+                    service_name,
+                    args,
+                    lambda: list(self._stream_uncached(service_name, *args)),
+                ),
+            )
+            return
+
+        yield from self._stream_uncached(service_name, *args)
+
+    def _stream_uncached(self, service_name, *args) -> t.Iterator:
+        req = self._request(service_name, args)
+        postdata = json.dumps(req)
+
+        logger.debug(
+            "[%s] streaming %s%s", self.public_url, service_name, _Payload(args)
+        )
+
+        timing = self.stats.started()
+        error: Op[BaseException] = None
+        try:
+            conn, http_response = self._send(
+                postdata,
+                timing,
+                self.timeout_for(service_name),
+                idempotent=service_name in READ_ONLY_METHODS,
+            )
+        except BaseException as e:
+            self._record(service_name, timing, e)
+            raise
+
+        count = 0
+        tee: Op[t.List[bytes]] = [] if self.recorder else None
+        # Reading and decoding are interleaved (with the consumer's processing,
+        # too), so they're timed together as "read".
+        read_start = time.perf_counter()
+        try:
+            for item in _iter_result_array(
+                _CountingReader(http_response, timing, tee),
+                self._decoder,
+                req["id"],
+            ):
+                count += 1
+                yield item
+        except JSONRPCError as e:
+            # The error object was read in full, so the connection can be reused.
+            self._release(conn, http_response)
+            error = e
+            raise
+        except json.JSONDecodeError:
+            conn.close()
+            error = JSONRPCError(
+                {
+                    "code": -342,
+                    "message": (
+                        "non-JSON HTTP response with '%i %s' from server"
+                        % (http_response.status, http_response.reason)
+                    ),
+                }
+            )
+            raise error
+        except BaseException as e:
+            # Includes the caller abandoning the generator partway through; the
+            # rest of the response is still in the socket.
+            conn.close()
+            error = e
+            raise
+        finally:
+            timing.mark("read", read_start)
+            self._record(service_name, timing, error)
+            if tee is not None:
+                self.recorder.record(  # type: ignore
+                    self.public_url,
+                    postdata,
+                    http_response.status,
+                    b"".join(tee).decode("utf8", "replace"),
+                    timing,
+                )
+
+        logger.debug("[%s] -> streamed %d items", self.public_url, count)
+        self._release(conn, http_response)
+
+    def _post(
+        self,
+        postdata: str,
+        timing: _CallTiming,
+        timeout: Op[float],
+        idempotent: bool = False,
+    ):
+        conn, http_response = self._send(postdata, timing, timeout, idempotent)
+        try:
+            now = time.perf_counter()
+            raw = http_response.read()
+            now = timing.mark("read", now)
+        except BaseException:
+            conn.close()
+            raise
+
+        self._release(conn, http_response)
+        timing.bytes_received += len(raw)
+        rdata = raw.decode("utf8")
+        if self.recorder:
+            self.recorder.record(
+                self.public_url, postdata, http_response.status, rdata, timing
+            )
+        try:
+            return self._decode(http_response.status, http_response.reason, rdata)
+        finally:
+            timing.mark("decode", now)
+
+    def _release(self, conn: httplib.HTTPConnection, http_response):
+        """Return a connection whose response has been read in full to the pool."""
+        if http_response.will_close:
+            conn.close()
+        self._pool.put(conn)
 
+    def _send(
+        self,
+        postdata: str,
+        timing: _CallTiming,
+        timeout: Op[float],
+        idempotent: bool = False,
+    ) -> t.Tuple[httplib.HTTPConnection, t.Any]:
+        """
+        Send a request and wait for the response headers. The caller is responsible
+        for reading the response body and then returning the connection to the
+        pool.
+
+        `timeout` bounds the call as a whole, retries included. Unless the request
+        is `idempotent`, it's only retried if it never made it to the server.
+        """
+        self._breaker.check()
+        headers = self._headers()
         path = self._parsed_url.path
         tries = 5
         backoff = 0.3
-        while tries:
+        reauthed = False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        timing.bytes_sent += len(postdata)
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout("timed out")
+            conn, reused = self._pool.get(remaining)
+            sent = False
             try:
-                conn = self._getconn()
+                now = time.perf_counter()
+                if conn.sock is None:
+                    conn.connect()
+                    now = timing.mark("connect", now)
                 conn.request("POST", path, postdata, headers)
+                sent = True
+                now = timing.mark("send", now)
+                http_response = conn.getresponse()
+                timing.mark("wait", now)
             except (BlockingIOError, http.client.CannotSendRequest, socket.gaierror):
+                conn.close()
                 logger.exception(
-                    f"hit request error: {path}, {postdata}, {self._parsed_url}"
+                    "hit request error: %s, %s, %s",
+                    path,
+                    _Payload(postdata),
+                    self.public_url,
                 )
                 tries -= 1
-                if not tries:
+                if (
+                    not tries
+                    or (sent and not idempotent)
+                    or (deadline is not None and time.monotonic() + backoff > deadline)
+                ):
                     raise
+                timing.retries += 1
                 time.sleep(backoff)
                 backoff *= 2
+            except ConnectionRefusedError:
+                conn.close()
+                # bitcoind is down (or restarting), so anything left in the pool
+                # is dead too.
+                self._pool.clear()
+                raise
+            except _STALE_CONN_ERRORS:
+                conn.close()
+                # The server may have acted on a request that was sent before the
+                # connection dropped, so only resend it if that's harmless.
+                if not reused or (sent and not idempotent):
+                    raise
+                # The server closed an idle keep-alive connection; try again
+                # with another.
+                logger.debug("[%s] pooled connection went stale", self.public_url)
+                timing.retries += 1
+            except BaseException:
+                conn.close()
+                raise
             else:
-                break
-
-        response = self._get_response(conn)
-        err = response.get("error")
-        if err is not None:
-            if isinstance(err, dict):
-                raise JSONRPCError(
-                    {
-                        "code": err.get("code", -345),
-                        "message": err.get("message", "error message not specified"),
-                    }
-                )
-            raise JSONRPCError({"code": -344, "message": str(err)})
-        elif "result" not in response:
-            raise JSONRPCError({"code": -343, "message": "missing JSON-RPC result"})
-        else:
-            return response["result"]
-
-    def _get_response(self, conn):
-        http_response = conn.getresponse()
-        if http_response is None:
-            raise JSONRPCError(
-                {"code": -342, "message": "missing HTTP response from server"}
-            )
+                if (
+                    http_response.status == httplib.UNAUTHORIZED
+                    and not reauthed
+                    and self._reread_cookie()
+                ):
+                    # bitcoind restarted and wrote a new cookie.
+                    http_response.read()
+                    self._release(conn, http_response)
+                    headers = self._headers()
+                    reauthed = True
+                    timing.retries += 1
+                    continue
+                return (conn, http_response)
 
-        rdata = http_response.read().decode("utf8")
+    def _decode(self, status: int, reason: str, rdata: str):
         try:
-            loaded = json.loads(rdata, parse_float=Decimal)
-            logger.debug(f"[{self.public_url}] -> {loaded}")
+            loaded = self._decoder.decode(rdata)
+            logger.debug("[%s] -> %s", self.public_url, _Payload(loaded))
             return loaded
-        except Exception:
+        except json.JSONDecodeError:
             raise JSONRPCError(
                 {
                     "code": -342,
                     "message": (
                         "non-JSON HTTP response with '%i %s' from server: '%.20s%s'"
                         % (
-                            http_response.status,
-                            http_response.reason,
+                            status,
+                            reason,
                             rdata,
                             "..." if len(rdata) > 20 else "",
                         )
@@ -323,5 +1900,281 @@ class RawProxy(BaseProxy):
         _call_wrapper.__name__ = name
         return _call_wrapper
 
+    def batch(self, calls: t.Sequence[t.Sequence]) -> t.List:
+        """
+        Make several calls in one round-trip, e.g.
+
+            rpc.batch([("getaddressinfo", addr1), ("getaddressinfo", addr2)])
+
+        Per-call failures are returned (not raised) as JSONRPCError instances in
+        the corresponding position.
+        """
+        return self._batch(calls)
+
+    def stream(self, name: str, *args) -> t.Iterator:
+        """
+        Call a method that returns an array, yielding its elements as they arrive
+        instead of building the whole result in memory, e.g.
+
+            for utxo in rpc.stream("listunspent", 0):
+                ...
+        """
+        return self._stream(name, *args)
+
+
+class AsyncRawProxy(BaseProxy):
+    """asyncio counterpart to ``RawProxy``.
+
+    Configuration and authentication are discovered exactly as for ``RawProxy``;
+    calls are coroutines, e.g. ``await rpc.getblockcount()``. Requests are sent
+    over a pool of keep-alive asyncio stream connections, with at most
+    `max_concurrency` in flight at once. Errors are raised as ``JSONRPCError``
+    and timeouts as ``socket.timeout``, as with the synchronous proxy.
+    """
+
+    _concurrent = True
+
+    def __init__(
+        self,
+        service_url=None,
+        service_port=None,
+        btc_conf_file=None,
+        timeout=DEFAULT_HTTP_TIMEOUT,
+        max_concurrency: int = DEFAULT_ASYNC_CONCURRENCY,
+        **kwargs,
+    ):
+        super(AsyncRawProxy, self).__init__(
+            service_url=service_url,
+            service_port=service_port,
+            btc_conf_file=btc_conf_file,
+            timeout=timeout,
+            **kwargs,
+        )
+        self.max_concurrency = max_concurrency
+        self._idle: t.List[
+            t.Tuple["asyncio.StreamReader", "asyncio.StreamWriter"]
+        ] = []
+        # Created lazily so that it binds to the running event loop.
+        self._semaphore: Op["asyncio.Semaphore"] = None
+
+    def __getattr__(self, name):
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError
+
+        async def _call_wrapper(*args):
+            return await self._call(name, *args)
+
+        _call_wrapper.__name__ = name
+        return _call_wrapper
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close all idle connections."""
+        idle, self._idle = self._idle, []
+        for (_, writer) in idle:
+            writer.close()
+
+    async def batch(self, calls: t.Sequence[t.Sequence]) -> t.List:
+        """See ``RawProxy.batch``."""
+        if not calls:
+            return []
+
+        reqs = [self._request(service_name, args) for (service_name, *args) in calls]
+
+        logger.debug("[%s] calling batch of %d", self.public_url, len(reqs))
+
+        timing = self.stats.started()
+        timeout = self.timeout_for(*(r["method"] for r in reqs))
+        idempotent = all(r["method"] in READ_ONLY_METHODS for r in reqs)
+        error = None
+        try:
+            return self._unpack_batch(
+                reqs, await self._post(json.dumps(reqs), timing, timeout, idempotent)
+            )
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._record("batch", timing, error)
+
+    async def _call(self, service_name, *args):
+        req = self._request(service_name, args)
+        postdata = json.dumps(req)
+
+        logger.debug("[%s] calling %s%s", self.public_url, service_name, _Payload(args))
+
+        timing = self.stats.started()
+        error = None
+        try:
+            return self._unpack(
+                await self._post(
+                    postdata,
+                    timing,
+                    self.timeout_for(service_name),
+                    idempotent=service_name in READ_ONLY_METHODS,
+                ),
+                req["id"],
+            )
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._record(service_name, timing, error)
+
+    async def _post(
+        self,
+        postdata: str,
+        timing: _CallTiming,
+        timeout: Op[float],
+        idempotent: bool = False,
+    ):
+        # asyncio is slow to import, and only needed here; keep it off the
+        # startup path of commands that never make async calls.
+        import asyncio
+
+        self._breaker.check()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self.stats.waiting(1)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.stats.waiting(-1)
+
+        try:
+            return await asyncio.wait_for(
+                self._exchange(postdata.encode("utf8"), timing, idempotent), timeout
+            )
+        except asyncio.TimeoutError:
+            raise socket.timeout("timed out")
+        finally:
+            self._semaphore.release()
+
+    def _request_head(self, body: bytes) -> bytes:
+        headers = self._headers()
+        headers["Content-Length"] = str(len(body))
+        lines = [f"POST {self._parsed_url.path or '/'} HTTP/1.1"]
+        for k, v in headers.items():
+            lines.append(f"{k}: {v.decode() if isinstance(v, bytes) else v}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _exchange(self, body: bytes, timing: _CallTiming, idempotent: bool):
+        import asyncio
+
+        head = self._request_head(body)
+        reauthed = False
+
+        while True:
+            now = time.perf_counter()
+            reader, writer, reused = await self._getconn()
+            if not reused:
+                now = timing.mark("connect", now)
+            sent = False
+            try:
+                writer.write(head + body)
+                await writer.drain()
+                sent = True
+                now = timing.mark("send", now)
+                (status, reason, will_close, rdata) = await _read_http_response(reader)
+                now = timing.mark("read", now)
+            except (_STALE_CONN_ERRORS + (asyncio.IncompleteReadError,)):
+                writer.close()
+                # As with RawProxy, don't risk repeating a call with side effects.
+                if not reused or (sent and not idempotent):
+                    raise
+                logger.debug("[%s] pooled connection went stale", self.public_url)
+                timing.retries += 1
+            except BaseException:
+                writer.close()
+                raise
+            else:
+                timing.bytes_sent += len(body)
+                timing.bytes_received += len(rdata)
+                if will_close or len(self._idle) >= DEFAULT_POOL_SIZE:
+                    writer.close()
+                else:
+                    self._idle.append((reader, writer))
+                if (
+                    status == httplib.UNAUTHORIZED
+                    and not reauthed
+                    and self._reread_cookie()
+                ):
+                    head = self._request_head(body)
+                    reauthed = True
+                    timing.retries += 1
+                    continue
+                text = rdata.decode("utf8")
+                if self.recorder:
+                    self.recorder.record(
+                        self.public_url, body.decode("utf8"), status, text, timing
+                    )
+                try:
+                    return self._decode(status, reason, text)
+                finally:
+                    timing.mark("decode", now)
+
+    async def _getconn(
+        self,
+    ) -> t.Tuple["asyncio.StreamReader", "asyncio.StreamWriter", bool]:
+        import asyncio
+
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not (reader.at_eof() or writer.is_closing()):
+                return (reader, writer, True)
+            writer.close()
+
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        return (reader, writer, False)
+
+
+async def _read_http_response(
+    reader: "asyncio.StreamReader",
+) -> t.Tuple[int, str, bool, bytes]:
+    """Returns (status, reason, will_close, body)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise http.client.RemoteDisconnected("remote end closed connection")
+
+    parts = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+    version, status = parts[0], int(parts[1])
+    reason = parts[2] if len(parts) > 2 else ""
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        k, _, v = line.decode("latin-1").partition(":")
+        headers[k.strip().lower()] = v.strip()
+
+    will_close = headers.get("connection", "").lower() == "close" or (
+        version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive"
+    )
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+        will_close = True
+
+    return (status, reason, will_close, body)
+
 
 BitcoinRPC = RawProxy
@@ -127,7 +127,7 @@ class Arg:
             kwargs["action"] = "store_false" if self.default else "store_true"
             kwargs.pop("type", "")
 
-        logger.debug(f"Attaching argument: {self.names} -> {kwargs}")
+        logger.debug("Attaching argument: %s -> %s", self.names, kwargs)
         parser.add_argument(*self.names, **kwargs)  # type: ignore
 
     def update_name(self, name: str):
@@ -182,6 +182,11 @@ class App:
         self.parser = argparse.ArgumentParser(*args, **kwargs)
         self.subparsers = None
         self.args = argparse.Namespace()
+        # Subcommands by name. Their parsers are only filled in (see `_build_cmd`)
+        # when they're invoked, so that startup doesn't pay to inspect every
+        # command's signature and docstring.
+        self.commands: t.Dict[str, t.Callable] = {}
+        self._built: t.Set[str] = set()
 
     def add_arg(self, *args, **kwargs):
         self.parser.add_argument(*args, **kwargs)
@@ -208,6 +213,26 @@ class App:
         if not self.subparsers:
             self.subparsers = self.parser.add_subparsers()
 
+        name = fnc.__name__.replace("_", "-")
+        # Without -h, so that `<cmd> --help` is left for the built parser.
+        sub = self.subparsers.add_parser(name, add_help=False)
+        sub.set_defaults(func=fnc)
+        self.commands[name] = fnc
+        logger.debug("Added subparser: %s", sub)
+
+        @functools.wraps(fnc)
+        def wrapper(*args, **kwargs):
+            return fnc(*args, **kwargs)
+
+        return wrapper
+
+    def _build_cmd(self, name: str):
+        """Add the arguments and description of subcommand `name` to its parser."""
+        if name in self._built:
+            return
+        fnc = self.commands[name]
+        sub = self.subparsers.choices[name]  # type: ignore
+
         desc = fnc.__doc__ or ""
         doclines = []
 
@@ -216,26 +241,33 @@ class App:
                 break
             doclines.append(line)
 
-        sub = self.subparsers.add_parser(
-            fnc.__name__.replace("_", "-"),
-            description="\n".join(doclines),
+        sub.description = "\n".join(doclines)
+        sub.add_argument(
+            "-h",
+            "--help",
+            action="help",
+            default=argparse.SUPPRESS,
+            help="show this help message and exit",
         )
-        logger.debug("Added subparser: %s", sub)
 
         for arg in Arg.from_func(fnc):
             arg.add_to_parser(sub)
             logger.debug("  Adding argument: %s", arg)
 
-        sub.set_defaults(func=fnc)
-
-        @functools.wraps(fnc)
-        def wrapper(*args, **kwargs):
-            return fnc(*args, **kwargs)
+        self._built.add(name)
 
-        return wrapper
+    def parse_for_run(
+        self, argv: t.Optional[t.List[str]] = None
+    ) -> t.Tuple[t.Callable, t.Tuple[t.List, t.Dict]]:
+        # Find out which subcommand is being run (leaving its arguments unparsed),
+        # then build its parser and parse for real.
+        (known, _) = self.parser.parse_known_args(argv)
+        fnc = getattr(known, "func", None)
+        name = fnc.__name__.replace("_", "-") if fnc else None
+        if name in self.commands:
+            self._build_cmd(name)  # type: ignore
 
-    def parse_for_run(self) -> t.Tuple[t.Callable, t.Tuple[t.List, t.Dict]]:
-        self.args = self.parser.parse_args()
+        self.args = self.parser.parse_args(argv)
         args = vars(self.args)
         logger.debug("Parsed args: %s", args)
         fnc = args.pop("func", None)
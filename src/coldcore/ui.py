@@ -7,9 +7,7 @@ import time
 import subprocess
 import sys
 import traceback
-import socket
 import threading
-import platform
 import base64
 import datetime
 import shutil
@@ -18,19 +16,36 @@ import json
 import decimal
 from dataclasses import dataclass
 from pathlib import Path
+import collections
 from collections import namedtuple
 
+from .thirdparty.bitcoin_rpc import Amount, default_tracer, default_rpc_stats, default_single_flight  # noqa
+
 
 logger = logging.getLogger("ui")
 
 
 class DecimalEncoder(json.JSONEncoder):
+    def iterencode(self, o, _one_shot=False):
+        # Amounts are ints, so would otherwise be encoded as satoshis.
+        return super().iterencode(_amounts_to_btc(o), _one_shot)
+
     def default(self, o):
         if isinstance(o, decimal.Decimal):
             return str(o)
         return super(DecimalEncoder, self).default(o)
 
 
+def _amounts_to_btc(o):
+    if isinstance(o, Amount):
+        return o.btc
+    elif isinstance(o, dict):
+        return {k: _amounts_to_btc(v) for k, v in o.items()}
+    elif isinstance(o, (list, tuple)):
+        return [_amounts_to_btc(v) for v in o]
+    return o
+
+
 colr = curses.color_pair
 _use_color_no_tty = True
 
@@ -44,11 +59,9 @@ def use_color():
 
 
 def open_file_browser():
-    plat = platform.system()
-
-    if plat == "Linux":
+    if sys.platform.startswith("linux"):
         cmd = "xdg-open ."
-    elif plat == "Darwin":
+    elif sys.platform == "darwin":
         cmd = "open ."
     # TODO windows support
 
@@ -239,10 +252,18 @@ class Scene:
         self.config = conf
         self.wallet_configs = wconfs
         self.controller = controller
+        # Set by draw_menu().
+        self.perf: t.Optional["PerfOverlay"] = None
+        self.pollers: t.List["PollerStatus"] = []
 
     def draw(self, k: int) -> t.Tuple[int, Action]:
         pass
 
+    def finish_frame(self):
+        """Call when done drawing, before waiting for input."""
+        if self.perf:
+            self.perf.end_frame(self.scr, self.pollers)
+
 
 class MenuItem(namedtuple("MenuItem", "idx,title,action")):
     def args(self, mchoice):
@@ -256,7 +277,6 @@ def run_setup(config, controller) -> t.Tuple[t.Any, t.Any]:
 
     formatter = OutputFormatter()
     p = formatter.p
-    section = formatter.section
     inp = formatter.inp
     blank = formatter.blank
     warn = formatter.warn
@@ -264,7 +284,15 @@ def run_setup(config, controller) -> t.Tuple[t.Any, t.Any]:
     done = formatter.done
     task = formatter.task
     spin = formatter.spin
-    finish = formatter.finish
+
+    # Each section is a step in the trace (see --trace).
+    def section(s: str):
+        default_tracer.step(s)
+        formatter.section(s)
+
+    def finish(config=None, wallet=None):
+        default_tracer.step(None)
+        return formatter.finish(config, wallet)
 
     title = cyan(
         f"""
@@ -278,6 +306,7 @@ def run_setup(config, controller) -> t.Tuple[t.Any, t.Any]:
     p(title)
 
     blank("searching for Bitcoin Core...")
+    default_tracer.step("Bitcoin Core discovery")
     rpc = controller.discover_rpc(config)
     if not rpc:
         warn("couldn't detect Bitcoin Core - make sure it's running locally, or")
@@ -417,6 +446,7 @@ def run_setup(config, controller) -> t.Tuple[t.Any, t.Any]:
 
     scan_result = {}  # type: ignore
     scan_thread = threading.Thread(
+        name="scantxoutset",
         target=_run_scantxoutset,
         args=(config.rpc(wallet), wallet.scantxoutset_args(), scan_result),
     )
@@ -429,13 +459,19 @@ def run_setup(config, controller) -> t.Tuple[t.Any, t.Any]:
         time.sleep(0.2)
 
     p()
-    done("scan of UTXO set complete!")
-
-    unspents = scan_result["result"]["unspents"]
-    bal = sum([i["amount"] for i in unspents])
-    bal_str = yellow(bold(f"{bal} BTC"))
-    bal_count = yellow(bold(f"{len(unspents)} UTXOs"))
-    blank(f"found an existing balance of {yellow(bal_str)} across {yellow(bal_count)}")
+    if "result" in scan_result:
+        done("scan of UTXO set complete!")
+        unspents = scan_result["result"]["unspents"]
+        bal = Amount(sum([i["amount"] for i in unspents]))
+        bal_str = yellow(bold(f"{bal} BTC"))
+        bal_count = yellow(bold(f"{len(unspents)} UTXOs"))
+        blank(
+            f"found an existing balance of {yellow(bal_str)} across {yellow(bal_count)}"
+        )
+    else:
+        unspents = []
+        warn("scan of UTXO set failed, so any existing balance won't show up yet")
+        warn(f"to find it, run `bitcoin-cli -rpcwallet={wallet.name} rescanblockchain`")
 
     if unspents:
         rescan_begin_height = min([i["height"] for i in unspents])
@@ -446,6 +482,7 @@ def run_setup(config, controller) -> t.Tuple[t.Any, t.Any]:
         )
         blank("  this allows us to find transactions associated with your coins")
         rescan_thread = threading.Thread(
+            name="rescanblockchain",
             target=_run_rescan,
             args=(config.rpc(wallet), rescan_begin_height),
             daemon=True,
@@ -508,7 +545,7 @@ def run_setup(config, controller) -> t.Tuple[t.Any, t.Any]:
 
     # Send 90% of the value over.
     # TODO this is only for testing and is potentially dangerous
-    send_amt = str((got_utxo.amount * 9) / 10)
+    send_amt = str(Amount(got_utxo.amount * 9 // 10))
     prepared_tx = controller.prepare_send(
         config,
         rpcw,
@@ -598,15 +635,17 @@ $$ |  $$ |\$$$$$$$\   \$  /   \$$$$$$$\ $$ |            $$$$$$$  |\$$$$$$$\ $$ |
 def _run_scantxoutset(rpcw, args, result):
     try:
         result["result"] = rpcw.scantxoutset(*args)
-    except socket.timeout:
-        logger.exception("socket timed out during txoutsetscan (this is expected)")
+    except Exception:
+        # Left for run_setup() to report.
+        logger.exception("txoutsetscan failed")
 
 
 def _run_rescan(rpcw, begin_height: int):
     try:
         rpcw.rescanblockchain(begin_height)
-    except socket.timeout:
-        logger.exception("socket timed out during rescan (this is expected)")
+    except Exception:
+        # Progress is polled separately with getwalletinfo.
+        logger.exception("rescan failed")
 
 
 class HomeScene(Scene):
@@ -704,6 +743,7 @@ class HomeScene(Scene):
 
         scr.move(0, 0)
 
+        self.finish_frame()
         # Refresh the screen
         scr.refresh()
 
@@ -735,20 +775,31 @@ class DashboardScene(Scene):
             return
 
         wall = self.wallet_configs[0]
+        self.pollers = [PollerStatus("utxos"), PollerStatus("blocks")]
         t1 = threading.Thread(
+            name="utxo-poller",
             target=_get_utxo_lines,
-            args=(self.config.rpc(wall), self.controller, self.utxos),
+            args=(
+                self.config.rpc(wall),
+                self.controller,
+                self.utxos,
+                self.pollers[0],
+            ),
         )
         t1.start()
         self.threads.append(t1)
 
         t2 = threading.Thread(
+            name="block-poller",
             target=_get_new_blocks,
-            args=(self.config.rpc(), self.blocks),
+            args=(self.config.rpc(), self.blocks, self.pollers[1]),
         )
         t2.start()
         self.threads.append(t2)
 
+        for (status, thread) in zip(self.pollers, self.threads):
+            status.thread = thread
+
         self.threads_started = True
         self.rpc = self.config.rpc()
 
@@ -820,7 +871,7 @@ class DashboardScene(Scene):
             sorted_utxos = sorted(self.utxos.values(), key=lambda u: -u.num_confs)[
                 -max_lines:
             ]
-            total_bal = f"{sum([u.amount for u in sorted_utxos])}"
+            total_bal = f"{Amount(sum([u.amount for u in sorted_utxos]))}"
             i = 0
 
             for u in sorted_utxos:
@@ -893,10 +944,11 @@ class DashboardScene(Scene):
                     f"{b.time_saw} | block {b.height} (...{b.hash[-8:]}) - "
                     f"{b.median_fee} sat/B - "
                     f"{b.txs} txs - "
-                    f"subsidy: {b.subsidy / 100_000_000}"
+                    f"subsidy: {b.subsidy}"
                 )
                 _s(self.chain_win, 4 + i, 3, blockstr[:chainwidth])
 
+        self.finish_frame()
         scr.refresh()
 
         # scr.move(self.width, self.height)
@@ -917,7 +969,7 @@ class Block:
     height: int
     time_saw: datetime.datetime
     median_fee: float
-    subsidy: float
+    subsidy: Amount
     txs: int
 
 
@@ -925,27 +977,63 @@ stop_threads_event = threading.Event()
 utxos_lock = threading.Lock()
 blocks_lock = threading.Lock()
 
+# How many recent blocks the dashboard keeps; it only shows as many as fit.
+MAX_BLOCK_HISTORY = 100
 
-def _get_new_blocks(rpc, blocks):
+
+class PollerStatus:
+    """What a background poller is up to, for the performance overlay."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "starting"
+        self.thread: t.Optional[threading.Thread] = None
+        # When the poller last got a response (time.monotonic()).
+        self.last_ok: t.Optional[float] = None
+        self.errors = 0
+
+    def polling(self):
+        self.state = "polling"
+
+    def succeeded(self):
+        self.state = "sleeping"
+        self.last_ok = time.monotonic()
+
+    def failed(self):
+        self.state = "failing"
+        self.errors += 1
+
+
+def _get_new_blocks(rpc, blocks, status: t.Optional[PollerStatus] = None):
     last_saw = None
+    status = status or PollerStatus("blocks")
 
     while True:
-        saw = rpc.getbestblockhash()
-
-        if saw != last_saw:
-            stats = rpc.getblockstats(saw)
-            with blocks_lock:
-                blocks.append(
-                    Block(
-                        saw,
-                        stats["height"],
-                        datetime.datetime.now(),
-                        stats["feerate_percentiles"][2],
-                        stats["subsidy"],
-                        stats["txs"],
+        status.polling()
+        try:
+            saw = rpc.getbestblockhash()
+
+            if saw != last_saw:
+                stats = rpc.getblockstats(saw)
+                with blocks_lock:
+                    blocks.append(
+                        Block(
+                            saw,
+                            stats["height"],
+                            datetime.datetime.now(),
+                            stats["feerate_percentiles"][2],
+                            Amount(stats["subsidy"]),
+                            stats["txs"],
+                        )
                     )
-                )
-            last_saw = saw
+                    del blocks[:-MAX_BLOCK_HISTORY]
+                last_saw = saw
+        except Exception:
+            # Keep polling; bitcoind may just be restarting.
+            logger.exception("failed to poll for new blocks")
+            status.failed()
+        else:
+            status.succeeded()
 
         time.sleep(1)
 
@@ -953,16 +1041,26 @@ def _get_new_blocks(rpc, blocks):
             return
 
 
-def _get_utxo_lines(rpcw, controller, utxos):
+def _get_utxo_lines(
+    rpcw, controller, utxos, status: t.Optional[PollerStatus] = None
+):
     """
     Poll constantly for new UTXOs.
     """
-    while True:
-        new_utxos = controller.get_utxos(rpcw)
+    status = status or PollerStatus("utxos")
 
-        with utxos_lock:
-            utxos.clear()
-            utxos.update(new_utxos)
+    while True:
+        status.polling()
+        try:
+            new_utxos = controller.get_utxos(rpcw)
+        except Exception:
+            logger.exception("failed to poll for UTXOs")
+            status.failed()
+        else:
+            with utxos_lock:
+                utxos.clear()
+                utxos.update(new_utxos)
+            status.succeeded()
 
         time.sleep(1)
 
@@ -992,11 +1090,16 @@ def draw_menu(scr, config, wallet_configs, controller, action=None):
 
     home = HomeScene(scr, config, wallet_configs, controller)
     dashboard = DashboardScene(scr, config, wallet_configs, controller)
+    home.perf = dashboard.perf = perf = PerfOverlay()
 
     action = action or GoHome
     k = 0
 
     while action != Quit:
+        perf.start_frame()
+        if k == ord("p"):
+            perf.visible = not perf.visible
+
         # Initialization
         scr.clear()
         height, width = scr.getmaxyx()
@@ -1008,7 +1111,10 @@ def draw_menu(scr, config, wallet_configs, controller, action=None):
         except ValueError:
             kstr = "???"
 
-        statusbarstr = f"press 'q' to exit | never sell | last keypress: {kstr} ({k})"
+        statusbarstr = (
+            f"press 'q' to exit | 'p' for performance | never sell | "
+            f"last keypress: {kstr} ({k})"
+        )
         if k == -1:
             statusbarstr += " | waiting"
         # Render status bar
@@ -1041,6 +1147,79 @@ def draw_menu(scr, config, wallet_configs, controller, action=None):
             break
 
 
+class PerfOverlay:
+    """
+    A box of live performance figures, toggled with 'p': how long frames take
+    to draw, how fresh the pollers' data is, how RPCs are faring, and the
+    process's memory use.
+    """
+
+    WIDTH = 46
+
+    def __init__(self):
+        self.visible = False
+        self.frame_times: t.Deque[float] = collections.deque(maxlen=50)
+        self._frame_start = time.perf_counter()
+
+    def start_frame(self):
+        self._frame_start = time.perf_counter()
+
+    def end_frame(self, scr, pollers: t.List[PollerStatus]):
+        self.frame_times.append(time.perf_counter() - self._frame_start)
+        if self.visible:
+            try:
+                self.draw(scr, pollers)
+            except curses.error:
+                # The screen is too small; never mind.
+                pass
+
+    def lines(self, pollers: t.List[PollerStatus]) -> t.List[str]:
+        ms = [f * 1000 for f in self.frame_times] or [0.0]
+        rpc = default_rpc_stats
+        p50, p90, p99 = (f * 1000 for f in rpc.recent_percentiles(50, 90, 99))
+        coalesced = default_single_flight.stats["coalesced_waiting"]
+        rss = rss_bytes()
+        lines = [
+            f"frame    {ms[-1]:.1f}ms (avg {sum(ms) / len(ms):.1f}, "
+            f"max {max(ms):.1f})",
+            f"rpc      {rpc.in_flight} in flight, {rpc.queued + coalesced} queued",
+            f"latency  p50 {p50:.0f}ms p90 {p90:.0f}ms p99 {p99:.0f}ms",
+        ]
+
+        now = time.monotonic()
+        for p in pollers:
+            state = p.state
+            if p.thread and not p.thread.is_alive():
+                state = "stopped"
+            age = f"{now - p.last_ok:.1f}s old" if p.last_ok else "no data"
+            errors = f" ({p.errors} errs)" if p.errors else ""
+            lines.append(f"{p.name:<9}{state:<9}{age}{errors}")
+
+        lines.append(f"rss      {rss / (1024 * 1024):.1f}MB" if rss else "rss      ?")
+        return lines
+
+    def draw(self, scr, pollers: t.List[PollerStatus]):
+        lines = self.lines(pollers)
+        (height, width) = scr.getmaxyx()
+        win = scr.derwin(
+            len(lines) + 2, self.WIDTH, 1, max(0, width - self.WIDTH - 1)
+        )
+        win.erase()
+        win.box()
+        _s(win, 0, 2, " performance ")
+        for (i, line) in enumerate(lines):
+            _s(win, 1 + i, 2, line[: self.WIDTH - 4])
+
+
+def rss_bytes() -> t.Optional[int]:
+    """The current resident set size of this process, if we can tell."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
 @contextlib.contextmanager
 def attrs(scr, *attrs):
     for a in attrs: